@@ -0,0 +1,124 @@
+import os
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from database import DATA_DIR, BUSY_TIMEOUT_SECS, get_main_db, init_user_db
+
+# Admin analytics. Per-user counts live in main.db's user_stats, bumped by
+# record() whenever a user's data changes, so admin reports never open the
+# per-user databases. rebuild() reconciles the table from the user databases
+# themselves, scanning them in parallel with several ATTACHed per connection.
+# generations / cache_hits only exist as counters and are kept as-is.
+
+COUNTERS = ("pdfs", "storage_bytes", "cached_quizzes", "bank_questions", "sessions", "answered", "correct",
+            "generations", "cache_hits")
+SCANNED  = COUNTERS[:7]
+
+ANALYTICS_WORKERS = int(os.environ.get("ANALYTICS_WORKERS", "4"))
+ATTACH_BATCH      = 8      # SQLite allows 10 attached databases per connection
+
+def record(user_id: int, **deltas):
+    """Add deltas to a user's counters (and touch last_active). Best effort: a
+    failure here must not fail the write it describes; rebuild() repairs drift."""
+    cols = [c for c in COUNTERS if deltas.get(c)]
+    sql  = (f"INSERT INTO user_stats (user_id, last_active{''.join(', ' + c for c in cols)}) "
+            f"VALUES (?, datetime('now'){', ?' * len(cols)}) "
+            f"ON CONFLICT(user_id) DO UPDATE SET last_active = excluded.last_active"
+            + "".join(f", {c} = {c} + excluded.{c}" for c in cols))
+    try:
+        conn = get_main_db()
+        try:
+            conn.execute(sql, (user_id, *(deltas[c] for c in cols)))
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+def forget(user_id: int):
+    conn = get_main_db()
+    conn.execute("DELETE FROM user_stats WHERE user_id=?", (user_id,))
+    conn.commit()
+    conn.close()
+
+# ── Rebuild ──
+_SCAN_SQL = """SELECT {user_id},
+    (SELECT COUNT(*) FROM {s}.pdfs),
+    (SELECT COALESCE(SUM(size_bytes), 0) FROM {s}.pdfs),
+    (SELECT COUNT(*) FROM {s}.quiz_cache),
+    (SELECT COUNT(*) FROM {s}.question_bank),
+    (SELECT COALESCE(MAX(sessions), 0) FROM {s}.study_stats),
+    (SELECT COALESCE(MAX(answered), 0) FROM {s}.study_stats),
+    (SELECT COALESCE(MAX(correct), 0) FROM {s}.study_stats),
+    (SELECT MAX(finished_at) FROM {s}.sessions)"""
+
+def _user_db_path(user_id: int) -> str:
+    return os.path.join(DATA_DIR, "users", str(user_id), "data.db")
+
+def _scan_batch(user_ids: list[int]) -> list[tuple]:
+    """Stats rows for up to ATTACH_BATCH users from one connection and one query."""
+    user_ids = [u for u in user_ids if os.path.exists(_user_db_path(u))]
+    if not user_ids:
+        return []
+    conn = sqlite3.connect(":memory:", timeout=BUSY_TIMEOUT_SECS)
+    try:
+        for i, user_id in enumerate(user_ids):
+            conn.execute(f"ATTACH DATABASE ? AS u{i}", (_user_db_path(user_id),))
+        sql = " UNION ALL ".join(_SCAN_SQL.format(user_id=int(u), s=f"u{i}") for i, u in enumerate(user_ids))
+        try:
+            return conn.execute(sql).fetchall()
+        except sqlite3.OperationalError:
+            # A database not yet migrated to the current schema: migrate and retry
+            for user_id in user_ids:
+                init_user_db(user_id)
+            return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+def rebuild(workers: int | None = None) -> dict:
+    start = time.perf_counter()
+    conn  = get_main_db()
+    ids   = [r[0] for r in conn.execute("SELECT id FROM users ORDER BY id")]
+    conn.close()
+    batches = [ids[i:i + ATTACH_BATCH] for i in range(0, len(ids), ATTACH_BATCH)]
+    sets    = ", ".join(f"{c} = excluded.{c}" for c in SCANNED)
+    sql     = (f"INSERT INTO user_stats (user_id, {', '.join(SCANNED)}, last_active, rebuilt_at) "
+               f"VALUES (?{', ?' * len(SCANNED)}, ?, datetime('now')) "
+               f"ON CONFLICT(user_id) DO UPDATE SET {sets}, rebuilt_at = excluded.rebuilt_at, "
+               f"last_active = MAX(COALESCE(last_active, excluded.last_active), "
+               f"COALESCE(excluded.last_active, last_active))")
+    scanned = 0
+    with ThreadPoolExecutor(max_workers=workers or ANALYTICS_WORKERS, thread_name_prefix="analytics") as pool:
+        for rows in pool.map(_scan_batch, batches):
+            conn = get_main_db()
+            conn.executemany(sql, rows)
+            conn.commit()
+            conn.close()
+            scanned += len(rows)
+    return {"users": len(ids), "scanned": scanned, "batches": len(batches),
+            "seconds": round(time.perf_counter() - start, 3)}
+
+# ── Reports ──
+def _hit_ratio(hits: int, generations: int) -> float | None:
+    return round(hits / (hits + generations), 4) if hits + generations else None
+
+def list_users(limit: int, after_id: int = 0) -> list[dict]:
+    conn = get_main_db()
+    rows = conn.execute(
+        "SELECT u.id, u.username, u.email, u.is_admin, u.created_at, "
+        + ", ".join(f"COALESCE(s.{c}, 0) AS {c}" for c in COUNTERS)
+        + ", s.last_active FROM users u LEFT JOIN user_stats s ON s.user_id = u.id "
+          "WHERE u.id > ? ORDER BY u.id LIMIT ?", (after_id, limit)
+    ).fetchall()
+    conn.close()
+    return [{**dict(r), "cache_hit_ratio": _hit_ratio(r["cache_hits"], r["generations"])} for r in rows]
+
+def summary() -> dict:
+    conn = get_main_db()
+    row  = conn.execute(
+        "SELECT (SELECT COUNT(*) FROM users) AS users, "
+        + ", ".join(f"COALESCE(SUM({c}), 0) AS {c}" for c in COUNTERS)
+        + ", MIN(rebuilt_at) AS oldest_rebuild FROM user_stats"
+    ).fetchone()
+    conn.close()
+    return {**dict(row), "cache_hit_ratio": _hit_ratio(row["cache_hits"], row["generations"])}
@@ -1,42 +1,117 @@
 import os
+import time
+import hashlib
+import ipaddress
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from database import get_main_db
+from cache import TTLCache, make_cache
+from executors import Overloaded
 
 SECRET_KEY         = os.environ.get("SECRET_KEY", "change-me-in-production")
 ALGORITHM          = "HS256"
 TOKEN_EXPIRE_HOURS = 24 * 7
 
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2  = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# ── Auth caches ──
+# User rows and decoded tokens are cached so authenticated requests skip the
+# users-table lookup; admin changes call invalidate_user() to take effect now.
+# User rows use the shared backend so invalidations reach every worker. Decoded
+# tokens never change, so they stay in-process: sharing them would cost a
+# cache.db read per request for nothing.
+USER_CACHE_TTL  = float(os.environ.get("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+_user_cache  = make_cache("users", USER_CACHE_SIZE, USER_CACHE_TTL)
+_token_cache = TTLCache(USER_CACHE_SIZE, 300)
 
-def hash_password(password: str) -> str:
-    return pwd_ctx.hash(password)
+# ── Login rate limiting ──
+# Fixed windows counted in the shared cache: every attempt counts against the
+# client IP, failed ones against the account name; a success clears the latter.
+LOGIN_WINDOW_SECS   = int(os.environ.get("LOGIN_WINDOW_SECONDS", "300"))
+LOGIN_IP_LIMIT      = int(os.environ.get("LOGIN_IP_LIMIT", "30"))
+LOGIN_ACCOUNT_LIMIT = int(os.environ.get("LOGIN_ACCOUNT_LIMIT", "10"))
+_login_attempts = make_cache("login_attempts", USER_CACHE_SIZE, LOGIN_WINDOW_SECS)
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_ctx.verify(plain, hashed)
+# Peers in these networks are our reverse proxy (one hop: Caddy or nginx), so
+# the client is the right-most X-Forwarded-For entry, the one the proxy added.
+# Entries to its left come from the client and are never used.
+TRUSTED_PROXIES = [ipaddress.ip_network(n.strip(), strict=False)
+                   for n in os.environ.get("TRUSTED_PROXIES", "").split(",") if n.strip()]
+
+oauth2 = OAuth2PasswordBearer(tokenUrl="/auth/login")
+
+def client_ip(request: Request) -> str:
+    host = request.client.host if request.client else ""
+    try:
+        trusted = any(ipaddress.ip_address(host) in net for net in TRUSTED_PROXIES)
+    except ValueError:
+        trusted = False
+    if trusted:
+        forwarded = request.headers.get("x-forwarded-for", "").split(",")[-1].strip()
+        if forwarded:
+            return forwarded
+    return host
+
+def _window_key(kind: str, value: str) -> str:
+    return f"{kind}:{value.lower()}:{int(time.time() // LOGIN_WINDOW_SECS)}"
+
+def _bump(key: str) -> int:
+    return _login_attempts.incr(key)
+
+def check_login_rate(ip: str, account: str):
+    """Raise Overloaded (429) once the IP or account has too many failed logins in the window.
+    Successful logins don't count, so users behind one NAT aren't locked out by each other."""
+    retry_after = LOGIN_WINDOW_SECS - int(time.time() % LOGIN_WINDOW_SECS)
+    if _login_attempts.get(_window_key("account", account), 0) >= LOGIN_ACCOUNT_LIMIT:
+        raise Overloaded("Too many failed logins for this account, try again later", retry_after, 429)
+    if _login_attempts.get(_window_key("ip", ip), 0) >= LOGIN_IP_LIMIT:
+        raise Overloaded("Too many failed logins, try again later", retry_after, 429)
+
+def record_login_failure(ip: str, account: str):
+    _bump(_window_key("ip", ip))
+    _bump(_window_key("account", account))
+
+def clear_login_failures(account: str):
+    _login_attempts.delete(_window_key("account", account))
 
 def create_token(user_id: int) -> str:
     expire = datetime.utcnow() + timedelta(hours=TOKEN_EXPIRE_HOURS)
     return jwt.encode({"sub": str(user_id), "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str) -> int:
+    token_key = hashlib.sha256(token.encode()).hexdigest()   # never store raw tokens
+    cached    = _token_cache.get(token_key)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return int(payload["sub"])
+        user_id = int(payload["sub"])
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    # Never cache a token past its own expiry
+    ttl = min(_token_cache.ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        _token_cache.set(token_key, (user_id, payload["exp"]), ttl=ttl)
+    return user_id
+
+def invalidate_user(user_id: int):
+    _user_cache.delete(user_id)
+
+def cache_stats() -> dict:
+    return {"users": _user_cache.stats(), "tokens": _token_cache.stats()}
 
 def get_current_user(token: str = Depends(oauth2)):
     user_id = decode_token(token)
-    conn = get_main_db()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    user    = _user_cache.get(user_id)
+    if user is None:
+        conn = get_main_db()
+        row  = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        conn.close()
+        if not row:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = dict(row)
+        _user_cache.set(user_id, user)
     return dict(user)
 
 def require_admin(user=Depends(get_current_user)):
@@ -0,0 +1,48 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Worker pools for work kept off the request path. Jobs are keyed so
+# duplicates coalesce and callers can wait on one that is already running.
+# PDF ingestion (extraction, chunking, indexing) and question-bank fills get
+# separate pools: a fill blocks on LLM generation for a long time and must
+# not hold up extraction of freshly uploaded PDFs.
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+BANK_WORKERS   = int(os.environ.get("BANK_WORKERS", "1"))
+
+class KeyedPool:
+    def __init__(self, name: str, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._jobs: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, key: tuple, fn, args):
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def submit(self, key: tuple, fn, *args) -> Future:
+        """Run fn(*args) in the background unless a job with this key is already queued."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = self._executor.submit(self._run, key, fn, args)
+        return job
+
+    def job(self, key: tuple) -> Future | None:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def wait(self, key: tuple, timeout: float | None = None):
+        """Block until the job with this key (if any) has finished."""
+        job = self.job(key)
+        if job is not None:
+            job.result(timeout=timeout)
+
+ingestion = KeyedPool("background", INGEST_WORKERS)
+bank      = KeyedPool("bank-fill", BANK_WORKERS)
+
+submit = ingestion.submit
+wait   = ingestion.wait
@@ -0,0 +1,81 @@
+"""
+Benchmark: per-call sqlite3.connect vs pooled connections, replaying the DB
+work of an authenticated /pdfs/list (user lookup in main.db + list query in
+the user's data.db) from a thread pool.
+
+Usage (from backend/):
+    python -m bench.bench_db --users 50 --requests 5000 --threads 16
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-db-")
+import database
+
+LIST_SQL = ("SELECT p.id, p.name, p.filename, p.size_bytes, p.uploaded_at, "
+            "pr.total_answered, pr.total_correct, pr.sessions, pr.last_score, pr.last_session "
+            "FROM pdfs p LEFT JOIN progress pr ON pr.pdf_id = p.id ORDER BY p.name")
+
+def seed(num_users: int):
+    database.init_main_db()
+    conn = database.get_main_db()
+    for i in range(num_users):
+        conn.execute("INSERT INTO users (username, email, hashed_password) VALUES (?,?,?)",
+                     (f"user{i}", f"user{i}@example.com", "x"))
+    conn.commit()
+    conn.close()
+    for uid in range(1, num_users + 1):
+        database.init_user_db(uid)
+        conn = database.get_user_db(uid)
+        conn.executemany("INSERT INTO pdfs (name, filename, size_bytes) VALUES (?,?,?)",
+                         [(f"Book {j}", f"book{j}.pdf", 1000) for j in range(10)])
+        conn.commit()
+        conn.close()
+
+def legacy_list(user_id: int):
+    os.makedirs(database.DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(database.MAIN_DB)
+    conn.row_factory = sqlite3.Row
+    conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    conn.close()
+    path = os.path.join(database.DATA_DIR, "users", str(user_id))
+    os.makedirs(path, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(path, "data.db"))
+    conn.row_factory = sqlite3.Row
+    conn.execute(LIST_SQL).fetchall()
+    conn.close()
+
+def pooled_list(user_id: int):
+    conn = database.get_main_db()
+    conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    conn.close()
+    conn = database.get_user_db(user_id)
+    conn.execute(LIST_SQL).fetchall()
+    conn.close()
+
+def run(fn, num_users: int, num_requests: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(fn, (1 + i % num_users for i in range(num_requests))))
+    return num_requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    seed(args.users)
+    legacy = run(legacy_list, args.users, args.requests, args.threads)
+    pooled = run(pooled_list, args.users, args.requests, args.threads)
+    print(f"per-call connect: {legacy:8.0f} req/s")
+    print(f"pooled          : {pooled:8.0f} req/s  ({pooled / legacy:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark: serial vs process-pool PDF page extraction.
+
+Usage (from backend/):
+    python -m bench.bench_extract --pages 200 --workers 4
+    python -m bench.bench_extract --pdf /path/to/textbook.pdf
+"""
+
+import os
+import time
+import tempfile
+import argparse
+from bench.sample_pdf import make_pdf, sample_pages
+from pdf_parser import extract_pages
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", help="existing PDF to extract (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    path = args.pdf
+    if not path:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(make_pdf(sample_pages(args.pages)))
+
+    results = {}
+    for workers in (1, args.workers):
+        start = time.perf_counter()
+        pages = extract_pages(path, workers=workers)
+        results[workers] = pages
+        print(f"workers={workers:<3} pages={len(pages):<5} {time.perf_counter() - start:6.2f}s")
+    assert results[1] == results[args.workers], "parallel output differs from serial"
+
+    if not args.pdf:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
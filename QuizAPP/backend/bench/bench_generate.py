@@ -0,0 +1,47 @@
+"""
+Benchmark: sequential vs concurrent per-chunk quiz generation.
+
+Usage (from backend/):
+    python -m bench.bench_generate --chunks 15 --latency 0.5 --concurrency 5
+"""
+
+import os
+import time
+import tempfile
+import argparse
+from bench.fake_openai import serve_in_thread
+from pdf_parser import CHUNK_TOKENS
+
+def synthetic_text(num_chunks: int) -> str:
+    para = "The mitochondrion is the powerhouse of the cell. " * 20
+    # ~CHUNK_TOKENS per chunk (at ~4 chars/token); paragraphs are unique
+    per_chunk = CHUNK_TOKENS * 4 // (len(para) + 12)
+    return "\n\n".join(f"Section {i}. {para}" for i in range(per_chunk * num_chunks))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=15)
+    parser.add_argument("--questions", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    _, url = serve_in_thread(args.latency)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-generate-")
+    from database import init_content_db
+    from quiz_generator import generate_quiz
+    from pdf_parser import chunk_text
+    init_content_db()
+
+    text = synthetic_text(args.chunks)
+    print(f"chunks={len(chunk_text(text))} questions={args.questions} latency={args.latency}s")
+    for concurrency in (1, args.concurrency):
+        start = time.perf_counter()
+        quiz  = generate_quiz(text, num_questions=args.questions, concurrency=concurrency, use_cache=False)
+        took  = time.perf_counter() - start
+        print(f"concurrency={concurrency:<3} questions={len(quiz['questions']):<3} {took:6.2f}s")
+
+if __name__ == "__main__":
+    main()
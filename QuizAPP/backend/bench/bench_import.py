@@ -0,0 +1,108 @@
+"""
+Cold-start benchmark: how long `import main` and `uvicorn main:app` take to
+become ready, against a budget.
+
+Runs each measurement --runs times in fresh processes, with an empty
+DATA_DIR and no OPENAI_API_KEY (importing the app must not need it):
+  - import:  `python -X importtime -c "import main"`, median total, plus the
+             slowest top-level imports and whether any deferred dependency
+             (openai, pdfplumber, razorpay, tiktoken) was loaded anyway
+  - startup: spawn uvicorn, time until /health answers 200
+Prints JSON and exits 1 when a median is over its budget, so CI can track it.
+
+Usage (from backend/):
+    python -m bench.bench_import --runs 5 --import-budget-ms 1500 --startup-budget-ms 2500
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+import httpx
+from bench.loadtest import BACKEND_DIR, free_port
+
+DEFERRED  = ("openai", "pdfplumber", "pdfminer", "razorpay", "tiktoken")
+IMPORT_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+
+def clean_env() -> dict:
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-import-")
+    return env
+
+def measure_import() -> tuple[float, dict, list]:
+    """(seconds to import main, {top-level module: seconds}, deferred modules loaded)."""
+    probe = f"import main, sys, json; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    proc  = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=BACKEND_DIR,
+                           env=clean_env(), capture_output=True, text=True, check=True)
+    top, total = {}, 0.0
+    for line in proc.stderr.splitlines():
+        match = IMPORT_RE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(1)) / 1e6, len(match.group(2)), match.group(3)
+        if name == "main":
+            total = cumulative
+        elif depth <= 2:    # imported directly by main (or at top level)
+            top[name] = max(top.get(name, 0.0), cumulative)
+    return total, top, json.loads(proc.stdout.strip().splitlines()[-1])
+
+def measure_startup() -> float:
+    port  = free_port()
+    url   = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    proc  = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                             cwd=BACKEND_DIR, env=clean_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                if httpx.get(url, timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.02)
+        raise RuntimeError("server did not start")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1500)
+    parser.add_argument("--startup-budget-ms", type=float, default=2500)
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to report")
+    args = parser.parse_args()
+
+    imports, tops, loaded = [], {}, set()
+    for _ in range(args.runs):
+        total, top, deferred = measure_import()
+        imports.append(total)
+        loaded.update(deferred)
+        for name, seconds in top.items():
+            tops.setdefault(name, []).append(seconds)
+    startups = [measure_startup() for _ in range(args.runs)]
+
+    import_ms  = statistics.median(imports) * 1000
+    startup_ms = statistics.median(startups) * 1000
+    slowest    = sorted(((statistics.median(v) * 1000, k) for k, v in tops.items()), reverse=True)[:args.top]
+    result = {
+        "import_main_ms":   round(import_ms, 1),
+        "import_budget_ms": args.import_budget_ms,
+        "startup_ms":       round(startup_ms, 1),
+        "startup_budget_ms": args.startup_budget_ms,
+        "slowest_imports_ms": {name: round(ms, 1) for ms, name in slowest},
+        "deferred_loaded":  sorted(loaded),
+        "ok": import_ms <= args.import_budget_ms and startup_ms <= args.startup_budget_ms and not loaded,
+    }
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
+
+if __name__ == "__main__":
+    main()
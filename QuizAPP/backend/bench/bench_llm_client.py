@@ -0,0 +1,122 @@
+"""
+LLM client resilience benchmark: success rate and latency of llm_client
+against the fake completion server under injected faults.
+
+Each scenario sends --requests calls (--concurrency at a time) through a
+fresh ResilientClient and reports successes, fail-fast rejections, upstream
+requests made and p50/p95/p99 call latency as JSON. The hedging scenarios
+first warm the latency window so a p95 exists.
+
+The outage_recovery check generates multi-chunk quizzes through
+quiz_generator during an outage and after it ends: once the breaker's
+cooldown has passed, a quiz must succeed again (exit status 1 otherwise).
+
+Usage (from backend/):
+    python -m bench.bench_llm_client --requests 200 --concurrency 10
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-llm-"))
+from openai import AsyncOpenAI
+from bench.fake_openai import serve_in_thread
+from bench.loadtest import percentile
+from llm_client import ResilientClient, CircuitBreaker, LLMUnavailable
+
+# name -> (fake server faults, ResilientClient kwargs)
+SCENARIOS = {
+    "baseline":     ({}, {}),
+    "errors_20pct": ({"error_rate": 0.2}, {}),
+    "rate_limited": ({"error_rate": 0.3, "error_status": 429, "retry_after": 1}, {}),
+    "slow_tail":    ({"slow_rate": 0.05, "slow_latency": 3.0, "jitter": 0.02}, {"hedge": False}),
+    "slow_tail_hedged": ({"slow_rate": 0.05, "slow_latency": 3.0, "jitter": 0.02}, {"hedge": True}),
+    "hang_deadline":    ({"slow_rate": 0.05, "slow_latency": 60.0}, {"attempt_timeout": 1.0, "deadline": 5.0}),
+    "outage":       ({"error_rate": 1.0, "error_status": 503}, {}),
+}
+
+async def run_scenario(latency: float, faults: dict, kwargs: dict, requests: int, concurrency: int) -> dict:
+    server, url = serve_in_thread(latency, **faults)
+    client = ResilientClient(AsyncOpenAI(api_key="fake", base_url=url, max_retries=0),
+                             breaker=CircuitBreaker(5, 2.0), **kwargs)
+    sem, latencies, outcomes = asyncio.Semaphore(concurrency), [], {"ok": 0, "unavailable": 0}
+
+    async def one(warmup: bool = False):
+        async with sem:
+            if warmup:
+                return await client.chat(model="fake", messages=[{"role": "user", "content": "warm"}])
+            start = time.perf_counter()
+            try:
+                await client.chat(model="fake", messages=[{"role": "user", "content": "generate 1 multiple choice questions"}])
+                outcomes["ok"] += 1
+            except LLMUnavailable:
+                outcomes["unavailable"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    if kwargs.get("hedge"):
+        # Warm the latency window without faults so hedging has a p95 to work from
+        server.faults.update(slow_rate=0.0)
+        await asyncio.gather(*(one(warmup=True) for _ in range(40)))
+        server.faults.update(faults)
+        server.completions = 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    latencies.sort()
+    return {**outcomes, "upstream_requests": server.completions, "injected_errors": server.errors,
+            "seconds": round(elapsed, 2), "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1)}
+
+def outage_recovery(latency: float, chunks: int = 5, cooldown: float = 0.5) -> dict:
+    """Outage, then recovery, seen by quizzes whose chunks call the LLM concurrently."""
+    import quiz_generator
+    from database import init_content_db
+    init_content_db()
+    server, url = serve_in_thread(latency, error_rate=1.0, error_status=503)
+    quiz_generator.set_llm(ResilientClient(AsyncOpenAI(api_key="fake", base_url=url, max_retries=0),
+                                           max_attempts=2, breaker=CircuitBreaker(3, cooldown)))
+    texts = [f"Recovery check chunk {i} {time.time()}" for i in range(chunks)]
+
+    def quiz() -> bool:
+        try:
+            quiz_generator.generate_quiz_from_chunks(texts, chunks, use_cache=False)
+            return True
+        except LLMUnavailable:
+            return False
+
+    during = [quiz() for _ in range(3)]
+    server.faults.update(error_rate=0.0)
+    time.sleep(cooldown + 0.1)
+    after = [quiz() for _ in range(3)]
+    server.shutdown()
+    quiz_generator.set_llm(None)
+    return {"during_outage_ok": sum(during), "after_recovery_ok": sum(after), "ok": not any(during) and all(after)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS) + ["outage_recovery"],
+                        choices=list(SCENARIOS) + ["outage_recovery"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1, help="normal fake completion latency")
+    args = parser.parse_args()
+    results = {}
+    for name in args.scenarios:
+        if name == "outage_recovery":
+            results[name] = outage_recovery(args.latency)
+        else:
+            faults, kwargs = SCENARIOS[name]
+            results[name] = asyncio.run(run_scenario(args.latency, faults, kwargs, args.requests, args.concurrency))
+        print(name, results[name], flush=True)
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if results.get("outage_recovery", {"ok": True})["ok"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Login-storm benchmark: how much does a burst of logins (bcrypt) hurt the
+rest of the API?
+
+Starts the app under gunicorn, measures /pdfs/list and /auth/me latency on
+their own, then again while a concurrent login storm runs, and reports login
+RPS and the other routes' p50/p95/p99 for both phases as JSON. Rate limits
+are lifted so every login reaches bcrypt.
+
+Usage (from backend/):
+    python -m bench.bench_login --storm 32 --concurrency 8 --duration 10
+"""
+
+import json
+import asyncio
+import argparse
+import tempfile
+from bench.fake_openai import serve_in_thread
+from bench.loadtest import SCENARIOS, start_server, stop_server, seed, drive
+
+async def run_phase(url, users, args, storm: bool) -> dict:
+    routes = ["pdfs_list", "auth_me"]
+    jobs   = [drive(url, users, SCENARIOS[name], args.concurrency, args.duration) for name in routes]
+    if storm:
+        jobs.append(drive(url, users, SCENARIOS["login"], args.storm, args.duration))
+    results = await asyncio.gather(*jobs)
+    return dict(zip(routes + (["login"] if storm else []), results))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--storm", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per other route")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--env", nargs="*", default=[], help="extra server env as KEY=VALUE, e.g. BCRYPT_ROUNDS=10")
+    args = parser.parse_args()
+
+    _, openai_url = serve_in_thread(0.01)
+    env = {"DATA_DIR": tempfile.mkdtemp(prefix="bench-login-"), "OPENAI_BASE_URL": openai_url,
+           "OPENAI_API_KEY": "fake", "SECRET_KEY": "bench",
+           "LOGIN_IP_LIMIT": "1000000", "LOGIN_ACCOUNT_LIMIT": "1000000"}
+    env.update(kv.split("=", 1) for kv in args.env)
+
+    proc, url = start_server(args.workers, env)
+    try:
+        users  = seed(url, args.users)
+        report = {"config": vars(args),
+                  "baseline": asyncio.run(run_phase(url, users, args, storm=False)),
+                  "storm":    asyncio.run(run_phase(url, users, args, storm=True))}
+    finally:
+        stop_server(proc)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Fake OpenAI chat-completions server for local benchmarks.
+
+Answers POST /v1/chat/completions with well-formed quiz JSON after a fixed
+latency, so quiz generation can be timed without network or API spend.
+
+Faults can be injected to exercise llm_client: a fraction of requests fail
+with --error-status (429 carries Retry-After), the first --fail-first
+requests always fail, latency gets +/- --jitter, and a fraction of requests
+are slow (--slow-rate / --slow-latency; a long slow latency acts as a hang).
+
+Usage:
+    python -m bench.fake_openai --port 8900 --latency 0.5
+    python -m bench.fake_openai --error-rate 0.2 --error-status 429 --retry-after 1
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake uvicorn main:app
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COUNT_RE = re.compile(r"generate (\d+) multiple choice questions")
+
+def fake_questions(n: int) -> list[dict]:
+    return [{
+        "question": f"Fake question {i + 1}?",
+        "concept_summary": "Generated by the fake completion server.",
+        "options": [
+            {"text": "Correct", "is_correct": True,  "explanation": "Because it is."},
+            {"text": "Wrong A", "is_correct": False, "explanation": "Because it is not."},
+            {"text": "Wrong B", "is_correct": False, "explanation": "Because it is not."},
+            {"text": "Wrong C", "is_correct": False, "explanation": "Because it is not."},
+        ],
+    } for i in range(n)]
+
+FAULTS = {"error_rate": 0.0, "error_status": 500, "retry_after": None, "fail_first": 0,
+          "jitter": 0.0, "slow_rate": 0.0, "slow_latency": 30.0}
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.5
+    faults  = FAULTS
+
+    def log_message(self, *args):
+        pass
+
+    def send_error_json(self, status: int):
+        payload = json.dumps({"error": {"message": f"Injected fault ({status})", "type": "fake_error",
+                                        "code": None}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if self.faults["retry_after"] is not None and status in (429, 503):
+            self.send_header("Retry-After", str(self.faults["retry_after"]))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body   = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        match  = COUNT_RE.search(prompt)
+        faults = self.faults
+        with self.server.lock:
+            self.server.completions += 1
+            seq = self.server.completions
+        if seq <= faults["fail_first"] or random.random() < faults["error_rate"]:
+            with self.server.lock:
+                self.server.errors += 1
+            return self.send_error_json(faults["error_status"])
+        slow = random.random() < faults["slow_rate"]
+        time.sleep(faults["slow_latency"] if slow else
+                   max(0.0, self.latency + random.uniform(-faults["jitter"], faults["jitter"])))
+        content = json.dumps({"questions": fake_questions(int(match.group(1)) if match else 1)})
+        payload = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # client gave up (timeout, or the losing side of a hedged request)
+
+def serve_in_thread(latency: float = 0.5, port: int = 0, **faults) -> tuple[ThreadingHTTPServer, str]:
+    """Start the fake server on a daemon thread; returns (server, base_url).
+    Keyword arguments override FAULTS; change server.faults to alter them live."""
+    unknown = set(faults) - set(FAULTS)
+    if unknown:
+        raise TypeError(f"unknown faults: {', '.join(sorted(unknown))}")
+    handler = type("FakeHandler", (Handler,), {"latency": latency, "faults": {**FAULTS, **faults}})
+    server  = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.faults         = handler.faults
+    server.completions    = 0   # requests received, for counting API calls
+    server.errors         = 0   # of which answered with an injected error
+    server.lock           = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="status of injected failures")
+    parser.add_argument("--retry-after", type=int, default=None, help="Retry-After seconds on 429/503")
+    parser.add_argument("--fail-first", type=int, default=0, help="fail this many requests first")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- seconds added to latency")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=30.0, help="latency of slow requests")
+    args = parser.parse_args()
+    server, url = serve_in_thread(args.latency, args.port, error_rate=args.error_rate,
+                                  error_status=args.error_status, retry_after=args.retry_after,
+                                  fail_first=args.fail_first, jitter=args.jitter,
+                                  slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    print(f"Fake OpenAI listening on {url} (latency {args.latency}s, faults {server.faults})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,177 @@
+"""
+Load-test harness for the API hot paths.
+
+Seeds N users (each with one PDF) into a temp DATA_DIR, stubs OpenAI with the
+latency-configurable fake server, starts the app under gunicorn and drives
+concurrent traffic against each endpoint scenario for a fixed duration.
+Reports requests, status counts, RPS and p50/p95/p99 latency per endpoint as
+JSON (stdout, or --out FILE) for comparison across commits.
+
+Usage (from backend/):
+    python -m bench.loadtest                                   # all scenarios, 1 worker
+    python -m bench.loadtest --workers 1 2 4 --scenarios pdfs_list auth_me
+    python -m bench.loadtest --users 20 --concurrency 32 --duration 10 --llm-latency 0.5 --out bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import httpx
+from bench.fake_openai import serve_in_thread
+from bench.sample_pdf import make_pdf, sample_pages
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD    = "bench-password"
+
+# ── Scenarios: (client, user, i) -> awaitable response ─────────
+SCENARIOS = {
+    "login":             lambda c, u, i: c.post("/auth/login", data={"username": u["name"], "password": PASSWORD}),
+    "auth_me":           lambda c, u, i: c.get("/auth/me", headers=u["headers"]),
+    "pdfs_list":         lambda c, u, i: c.get("/pdfs/list", headers=u["headers"]),
+    "generate_cached":   lambda c, u, i: c.post("/quiz/generate", headers=u["headers"],
+                                                json={"pdf_id": u["pdf_id"], "num_questions": 5}),
+    "generate_uncached": lambda c, u, i: c.post("/quiz/generate?fresh=true", headers=u["headers"],
+                                                json={"pdf_id": u["pdf_id"], "num_questions": 5}),
+    "save_progress":     lambda c, u, i: c.post("/quiz/save-progress", headers=u["headers"],
+                                                json={"pdf_id": u["pdf_id"], "pdf_name": "Bench",
+                                                      "questions_answered": 5, "questions_correct": i % 6,
+                                                      "score_pct": (i % 6) * 20}),
+    "upload":            lambda c, u, i: c.post("/pdfs/upload", headers=u["headers"], files=[
+                             ("files", (f"upload-{uuid.uuid4().hex[:12]}.pdf",
+                                        make_pdf([f"Upload {uuid.uuid4()}"] + sample_pages(2)),
+                                        "application/pdf"))]),
+}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int, env: dict) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--access-logfile", "/dev/null"],
+        cwd=BACKEND_DIR, env={**os.environ, **env, "WEB_CONCURRENCY": str(workers)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def seed(url: str, num_users: int) -> list[dict]:
+    """Create (or log back in) bench users, each with one PDF and a warm quiz cache."""
+    users = []
+    with httpx.Client(base_url=url, timeout=120) as client:
+        for n in range(num_users):
+            name = f"bench{n}"
+            r = client.post("/auth/signup", json={"username": name, "email": f"{name}@example.com",
+                                                  "password": PASSWORD})
+            if r.status_code != 200:
+                r = client.post("/auth/login", data={"username": name, "password": PASSWORD})
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+            pdfs    = client.get("/pdfs/list", headers=headers).json()
+            if not pdfs:
+                client.post("/pdfs/upload", headers=headers, files=[
+                    ("files", ("bench.pdf", make_pdf([f"Bench user {n}"] + sample_pages(5)), "application/pdf"))])
+                pdfs = client.get("/pdfs/list", headers=headers).json()
+            pdf_id = pdfs[0]["id"]
+            client.post("/quiz/generate", headers=headers, json={"pdf_id": pdf_id, "num_questions": 5})
+            users.append({"name": name, "headers": headers, "pdf_id": pdf_id})
+    return users
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+def summarize(latencies: list[float], statuses: dict, elapsed: float) -> dict:
+    latencies.sort()
+    return {"requests": len(latencies), "statuses": statuses, "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2)}
+
+async def drive(url: str, users: list[dict], scenario, concurrency: int, duration: float) -> dict:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+    limits   = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        async def worker(n: int):
+            i = n
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    status = str((await scenario(client, users[i % len(users)], i)).status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+                i += concurrency
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, statuses, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake OpenAI seconds per completion")
+    parser.add_argument("--env", nargs="*", default=[], help="extra server env as KEY=VALUE")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    _, openai_url = serve_in_thread(args.llm_latency)
+    env = {"DATA_DIR": tempfile.mkdtemp(prefix="bench-load-"), "OPENAI_BASE_URL": openai_url,
+           "OPENAI_API_KEY": "fake", "SECRET_KEY": "bench",
+           # measure raw throughput rather than admission control
+           "LLM_MAX_PER_USER": "1000", "LLM_MAX_INFLIGHT": "1000",
+           "LOGIN_IP_LIMIT": "1000000", "LOGIN_ACCOUNT_LIMIT": "1000000"}
+    env.update(kv.split("=", 1) for kv in args.env)
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "out"}, "results": []}
+    for workers in args.workers:
+        proc, url = start_server(workers, env)
+        try:
+            users = seed(url, args.users)
+            for name in args.scenarios:
+                result = asyncio.run(drive(url, users, SCENARIOS[name], args.concurrency, args.duration))
+                report["results"].append({"workers": workers, "endpoint": name, **result})
+                print(json.dumps(report["results"][-1]), file=sys.stderr)
+        finally:
+            stop_server(proc)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
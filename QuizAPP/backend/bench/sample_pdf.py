@@ -0,0 +1,31 @@
+"""Minimal dependency-free PDF writer for benchmark fixtures."""
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: list[str]) -> bytes:
+    """Build a PDF with one text page per entry (lines split on newlines)."""
+    n       = len(pages)
+    font_id = 3 + 2 * n
+    kids    = " ".join(f"{3 + 2 * i} 0 R" for i in range(n))
+    objs    = ["<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {n} >>"]
+    for i, text in enumerate(pages):
+        stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({_escape(l)}) '" for l in text.split("\n")) + " ET"
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {4 + 2 * i} 0 R "
+                    f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objs.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+def sample_pages(num_pages: int, lines_per_page: int = 50) -> list[str]:
+    line = "The mitochondrion is the powerhouse of the cell and drives oxidative phosphorylation"
+    return ["\n".join(f"{p}.{l} {line}" for l in range(lines_per_page)) for p in range(num_pages)]
@@ -0,0 +1,94 @@
+import os
+from database import get_blob_path, get_content_db, get_user_db, get_user_pdfs_dir
+from text_store import file_sha256
+
+# Content-addressed PDF storage. Every unique file is kept once under
+# blobs/<sha256[:2]>/<sha256>.pdf and reference-counted in content.db; user
+# pdfs rows with blob=1 point at it by sha256. Rows from before the blob store
+# keep their file under users/<id>/pdfs until adopt_legacy() moves it.
+
+def add_ref(sha256: str, size: int, staged_path: str | None = None):
+    """Take a reference on a blob, moving staged_path into place if the blob
+    file does not exist (otherwise the staged copy is deleted)."""
+    blob_path = get_blob_path(sha256)
+    conn = get_content_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT refcount FROM blobs WHERE sha256=?", (sha256,)).fetchone()
+        if staged_path:
+            if os.path.exists(blob_path):
+                os.remove(staged_path)
+            else:
+                # New blob, or a row whose file went missing: (re)store the file
+                os.replace(staged_path, blob_path)
+        if row:
+            # Never reset the count: other holders still reference this blob
+            conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256=?", (sha256,))
+        else:
+            conn.execute("INSERT INTO blobs (sha256, size_bytes, refcount) VALUES (?,?,1)", (sha256, size))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def release(sha256: str):
+    """Drop a reference; the file is deleted with the last one."""
+    conn = get_content_db()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256=?", (sha256,))
+    row = conn.execute("SELECT refcount FROM blobs WHERE sha256=?", (sha256,)).fetchone()
+    if row and row["refcount"] <= 0:
+        conn.execute("DELETE FROM blobs WHERE sha256=?", (sha256,))
+        try:
+            os.remove(get_blob_path(sha256))
+        except FileNotFoundError:
+            pass
+    conn.commit()
+    conn.close()
+
+def pdf_path(user_id: int, pdf_row) -> str:
+    if pdf_row["blob"]:
+        return get_blob_path(pdf_row["sha256"])
+    return os.path.join(get_user_pdfs_dir(user_id), pdf_row["filename"])
+
+def adopt_legacy(user_id: int, pdf_row) -> tuple[str, str | None]:
+    """Move a pre-blob-store file into the blob store (deduplicating it against
+    other users' copies); returns (path, sha256). Missing files are left alone."""
+    path = pdf_path(user_id, pdf_row)
+    if pdf_row["blob"]:
+        return path, pdf_row["sha256"]
+    try:
+        sha256 = pdf_row["sha256"] or file_sha256(path)
+    except FileNotFoundError:
+        sha256 = None      # missing, or just adopted by a concurrent request
+    # Concurrent adopters of the row (threads or workers) take turns on the user
+    # database's write lock and re-check the row inside it: only the first one
+    # moves the file and takes the reference.
+    conn = get_user_db(user_id)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM pdfs WHERE id=?", (pdf_row["id"],)).fetchone()
+        if row is None or row["blob"] or sha256 is None or not os.path.exists(path):
+            conn.rollback()
+            return (pdf_path(user_id, row) if row else path), (row["sha256"] if row else pdf_row["sha256"])
+        add_ref(sha256, os.path.getsize(path), path)
+        conn.execute("UPDATE pdfs SET sha256=?, blob=1 WHERE id=?", (sha256, row["id"]))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return get_blob_path(sha256), sha256
+
+def release_user(user_id: int):
+    """Release every blob referenced by a user's PDFs (used when deleting the user)."""
+    conn = get_user_db(user_id)
+    rows = conn.execute("SELECT sha256 FROM pdfs WHERE blob=1").fetchall()
+    conn.execute("UPDATE pdfs SET blob=0 WHERE blob=1")
+    conn.commit()
+    conn.close()
+    for r in rows:
+        release(r["sha256"])
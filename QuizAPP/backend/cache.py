@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import importlib
+import threading
+from collections import OrderedDict
+from database import DATA_DIR, ConnectionPool
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self.hits    = 0
+        self.misses  = 0
+        self._data: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def incr(self, key, amount: int = 1, ttl: float | None = None) -> int:
+        """Atomically add to a counter (starting from 0 with a fresh ttl); returns the new value."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                entry = (now + (self.ttl if ttl is None else ttl), 0)
+            self._data[key] = entry = (entry[0], entry[1] + amount)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return entry[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                    "backend": "memory"}
+
+class SQLiteCache:
+    """TTL cache in a local SQLite file (DATA_DIR/cache.db), shared by every worker
+    process on the host. Values must be JSON-serializable; hit/miss counters are
+    per process."""
+
+    PRUNE_EVERY = 256   # sets between expiry/size pruning passes
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, path: str | None = None):
+        self.namespace = namespace
+        self.maxsize   = maxsize
+        self.ttl       = ttl
+        self.hits      = 0
+        self.misses    = 0
+        self._sets     = 0
+        self._pool = ConnectionPool(path or os.path.join(DATA_DIR, "cache.db"), 8)
+        conn = self._pool.acquire()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                ns          TEXT NOT NULL,
+                key         TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                expires_at  REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def get(self, key, default=None):
+        conn = self._pool.acquire()
+        row  = conn.execute("SELECT value FROM cache WHERE ns=? AND key=? AND expires_at > ?",
+                            (self.namespace, str(key), time.time())).fetchone()
+        conn.close()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl: float | None = None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._pool.acquire()
+        conn.execute("INSERT OR REPLACE INTO cache (ns, key, value, expires_at) VALUES (?,?,?,?)",
+                     (self.namespace, str(key), json.dumps(value), expires))
+        self._sets += 1
+        if self._sets % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE ns=? AND expires_at <= ?", (self.namespace, time.time()))
+            conn.execute("DELETE FROM cache WHERE ns=? AND key IN (SELECT key FROM cache WHERE ns=? "
+                         "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                         (self.namespace, self.namespace, self.maxsize))
+        conn.commit()
+        conn.close()
+
+    def incr(self, key, amount: int = 1, ttl: float | None = None) -> int:
+        """Atomically add to a counter (starting from 0 with a fresh ttl) in one
+        statement, so concurrent workers never lose increments; returns the new value."""
+        now  = time.time()
+        conn = self._pool.acquire()
+        row  = conn.execute("""
+            INSERT INTO cache (ns, key, value, expires_at) VALUES (?,?,?,?)
+            ON CONFLICT(ns, key) DO UPDATE SET
+                value      = CASE WHEN expires_at > ? THEN CAST(value AS INTEGER) + ? ELSE excluded.value END,
+                expires_at = CASE WHEN expires_at > ? THEN expires_at ELSE excluded.expires_at END
+            RETURNING value""",
+            (self.namespace, str(key), json.dumps(amount), now + (self.ttl if ttl is None else ttl),
+             now, amount, now)).fetchone()
+        conn.commit()
+        conn.close()
+        return int(row[0])
+
+    def delete(self, key):
+        conn = self._pool.acquire()
+        conn.execute("DELETE FROM cache WHERE ns=? AND key=?", (self.namespace, str(key)))
+        conn.commit()
+        conn.close()
+
+    def clear(self):
+        conn = self._pool.acquire()
+        conn.execute("DELETE FROM cache WHERE ns=?", (self.namespace,))
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> dict:
+        conn = self._pool.acquire()
+        size = conn.execute("SELECT COUNT(*) FROM cache WHERE ns=? AND expires_at > ?",
+                            (self.namespace, time.time())).fetchone()[0]
+        conn.close()
+        total = self.hits + self.misses
+        return {"size": size, "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0, "backend": "sqlite"}
+
+# ── Backend selection ──
+# CACHE_BACKEND: "memory" (per process), "sqlite" (shared by all workers on the
+# host) or "package.module:Class" for a custom backend taking
+# (namespace, maxsize, ttl) and providing get/set/incr/delete/clear/stats.
+# Defaults to sqlite when running several workers.
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+CACHE_BACKEND   = os.environ.get("CACHE_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "memory")
+
+def make_cache(namespace: str, maxsize: int, ttl: float):
+    if CACHE_BACKEND == "memory":
+        return TTLCache(maxsize, ttl)
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCache(namespace, maxsize, ttl)
+    module, _, cls = CACHE_BACKEND.partition(":")
+    return getattr(importlib.import_module(module), cls)(namespace, maxsize, ttl)
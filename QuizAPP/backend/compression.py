@@ -0,0 +1,89 @@
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+
+# Response compression (brotli when the optional `brotli` package is installed
+# and the client accepts it, else gzip). Only complete, single-message bodies
+# over MINIMUM_SIZE are compressed: streams (SSE) pass through untouched so
+# events are not held back in a compressor buffer, and responses that are
+# already encoded (e.g. stored gzip quiz_cache hits) are left alone.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIMUM_SIZE   = 1024
+GZIP_LEVEL     = 6
+BROTLI_QUALITY = 5
+
+def accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    """Content codings from an Accept-Encoding header mapped to their q-value
+    (RFC 9110 12.5.3); malformed q-values count as 0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def accepts(accept_encoding: str, coding: str) -> bool:
+    """Whether the client takes this coding: listed with q > 0, or covered by "*" with q > 0."""
+    accepted = accepted_encodings(accept_encoding)
+    return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+def _choose(accept_encoding: str) -> str | None:
+    """Highest-q coding we can produce (br wins ties), or None for identity."""
+    accepted = accepted_encodings(accept_encoding)
+    best     = None
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (coding, q)
+    return best[0] if best else None
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app          = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = _choose(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is not None:
+                initial, start = start, None
+                headers = MutableHeaders(raw=initial["headers"])
+                body    = message.get("body", b"")
+                if (not message.get("more_body") and len(body) >= self.minimum_size
+                        and "content-encoding" not in headers
+                        and not headers.get("content-type", "").startswith("text/event-stream")):
+                    body = _compress(body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"]   = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "body": body}
+                await send(initial)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
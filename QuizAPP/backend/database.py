@@ -1,31 +1,221 @@
 import sqlite3
 import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from serialization import cached_quiz_body
 
 DATA_DIR = os.environ.get("DATA_DIR", "/data")
 MAIN_DB  = os.path.join(DATA_DIR, "main.db")
+# Shared, content-addressed data (extracted text etc.) — keyed by PDF sha256
+CONTENT_DB = os.path.join(DATA_DIR, "content.db")
 
-def get_main_db():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(MAIN_DB)
-    conn.row_factory = sqlite3.Row
+# ── Connection pooling ─────────────────────────────────────────
+# Connections are reused instead of opened per call: conn.close() hands the
+# connection back to its pool. Each connection is used by one thread at a
+# time, so pools are safe under FastAPI's threadpool.
+MAIN_POOL_SIZE      = int(os.environ.get("DB_POOL_SIZE", "16"))
+USER_POOL_SIZE      = int(os.environ.get("USER_DB_POOL_SIZE", "4"))
+USER_DB_CACHE       = int(os.environ.get("USER_DB_CACHE", "256"))        # users kept open (LRU)
+USER_DB_IDLE_SECS   = int(os.environ.get("USER_DB_IDLE_SECONDS", "300"))
+POOL_TIMEOUT_SECS   = 30
+STATEMENT_CACHE     = 256
+# With several worker processes writers contend for the same files; wait for
+# the lock instead of failing with "database is locked"
+BUSY_TIMEOUT_SECS   = float(os.environ.get("DB_BUSY_TIMEOUT", "15"))
+
+class PooledConnection(sqlite3.Connection):
+    _pool = None
+
+    def close(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.release(self)
+        else:
+            super().close()
+
+    def __del__(self):
+        # Dropped without close() (e.g. an exception mid-request): free its pool slot
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            with pool._lock:
+                pool.in_use -= 1
+                pool.opened -= 1
+            pool._slots.release()
+
+def _connect(path: str) -> PooledConnection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, factory=PooledConnection, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE, timeout=BUSY_TIMEOUT_SECS)
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_SECS * 1000)}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
-def get_user_dir(user_id: int) -> str:
-    path = os.path.join(DATA_DIR, "users", str(user_id))
-    os.makedirs(path, exist_ok=True)
+class ConnectionPool:
+    """Bounded pool of connections to one SQLite file."""
+
+    def __init__(self, path: str, size: int):
+        self.path      = path
+        self.last_used = time.monotonic()
+        self.opened    = 0    # live connections (idle + in use)
+        self.in_use    = 0
+        self._idle: list[PooledConnection] = []
+        self._slots  = threading.BoundedSemaphore(size)
+        self._lock   = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> PooledConnection:
+        if not self._slots.acquire(timeout=POOL_TIMEOUT_SECS):
+            raise sqlite3.OperationalError(f"connection pool exhausted: {self.path}")
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = _connect(self.path)
+                with self._lock:
+                    self.opened += 1
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        conn.row_factory = sqlite3.Row
+        conn._pool       = self
+        self.last_used   = time.monotonic()
+        return conn
+
+    def release(self, conn: PooledConnection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self.in_use -= 1
+                if not self._closed:
+                    self._idle.append(conn)
+                    conn = None
+                else:
+                    self.opened -= 1
+            if conn is not None:
+                sqlite3.Connection.close(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            self._closed, idle, self._idle = True, self._idle, []
+            self.opened -= len(idle)
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+_pools_lock = threading.Lock()
+_main_pool    = None
+_content_pool = None
+_user_pools: "OrderedDict[int, ConnectionPool]" = OrderedDict()
+_last_sweep = time.monotonic()
+
+# Directories already created by this process (skips repeated makedirs syscalls)
+_made_dirs: set[str] = set()
+
+def _ensure_dir(path: str) -> str:
+    if path not in _made_dirs:
+        os.makedirs(path, exist_ok=True)
+        _made_dirs.add(path)
     return path
 
+def get_main_db():
+    global _main_pool
+    if _main_pool is None:
+        with _pools_lock:
+            if _main_pool is None:
+                _ensure_dir(DATA_DIR)
+                _main_pool = ConnectionPool(MAIN_DB, MAIN_POOL_SIZE)
+    return _main_pool.acquire()
+
+def get_user_dir(user_id: int) -> str:
+    return _ensure_dir(os.path.join(DATA_DIR, "users", str(user_id)))
+
 def get_user_pdfs_dir(user_id: int) -> str:
-    path = os.path.join(get_user_dir(user_id), "pdfs")
-    os.makedirs(path, exist_ok=True)
-    return path
+    return _ensure_dir(os.path.join(get_user_dir(user_id), "pdfs"))
+
+# Content-addressed PDF storage: one file per unique sha256, shared by users
+def get_blob_path(sha256: str) -> str:
+    return os.path.join(_ensure_dir(os.path.join(DATA_DIR, "blobs", sha256[:2])), f"{sha256}.pdf")
+
+def get_blob_staging_dir() -> str:
+    return _ensure_dir(os.path.join(DATA_DIR, "blobs", "staging"))
+
+def get_content_db():
+    global _content_pool
+    if _content_pool is None:
+        with _pools_lock:
+            if _content_pool is None:
+                _ensure_dir(DATA_DIR)
+                _content_pool = ConnectionPool(CONTENT_DB, MAIN_POOL_SIZE)
+    return _content_pool.acquire()
+
+def _user_pool(user_id: int) -> ConnectionPool:
+    global _last_sweep
+    now     = time.monotonic()
+    evicted = []
+    with _pools_lock:
+        pool = _user_pools.get(user_id)
+        if pool is None:
+            pool = _user_pools[user_id] = ConnectionPool(
+                os.path.join(get_user_dir(user_id), "data.db"), USER_POOL_SIZE)
+        _user_pools.move_to_end(user_id)
+        while len(_user_pools) > USER_DB_CACHE:
+            evicted.append(_user_pools.popitem(last=False)[1])
+        if now - _last_sweep > 60:
+            _last_sweep = now
+            for uid in [u for u, p in _user_pools.items() if now - p.last_used > USER_DB_IDLE_SECS]:
+                evicted.append(_user_pools.pop(uid))
+    for p in evicted:
+        p.close()
+    return pool
+
+def evict_user_db(user_id: int):
+    """Close a user's pooled connections (e.g. after the user is deleted)."""
+    with _pools_lock:
+        pool = _user_pools.pop(user_id, None)
+    if pool is not None:
+        pool.close()
+    _ready_users.discard(user_id)
+
+def pool_stats() -> dict:
+    """Open connections per database kind and state, for /metrics."""
+    with _pools_lock:
+        pools = [("main", _main_pool), ("content", _content_pool)] + [("user", p) for p in _user_pools.values()]
+    stats = {}
+    for kind, pool in pools:
+        if pool is None:
+            continue
+        with pool._lock:
+            in_use, opened = pool.in_use, pool.opened
+        stats[(kind, "in_use")] = stats.get((kind, "in_use"), 0) + in_use
+        stats[(kind, "idle")]   = stats.get((kind, "idle"), 0) + opened - in_use
+    return stats
+
+# Users whose data.db schema has been created/migrated by this process
+_ready_users: set[int] = set()
 
 def get_user_db(user_id: int):
-    db_path = os.path.join(get_user_dir(user_id), "data.db")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+    conn = _user_pool(user_id).acquire()
+    if user_id not in _ready_users:
+        _create_user_schema(conn)
+        _ready_users.add(user_id)
     return conn
 
+def _add_column(conn, table: str, column: str, decl: str):
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        try:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):   # another worker migrated first
+                raise
+
 def init_main_db():
     conn = get_main_db()
     conn.execute("""
@@ -38,11 +228,74 @@ def init_main_db():
             created_at       TEXT    DEFAULT (datetime('now'))
         )
     """)
+    # ── Denormalized per-user stats for admin reports, see analytics.py ──
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id         INTEGER PRIMARY KEY,
+            pdfs            INTEGER NOT NULL DEFAULT 0,
+            storage_bytes   INTEGER NOT NULL DEFAULT 0,
+            cached_quizzes  INTEGER NOT NULL DEFAULT 0,
+            bank_questions  INTEGER NOT NULL DEFAULT 0,
+            sessions        INTEGER NOT NULL DEFAULT 0,
+            answered        INTEGER NOT NULL DEFAULT 0,
+            correct         INTEGER NOT NULL DEFAULT 0,
+            generations     INTEGER NOT NULL DEFAULT 0,
+            cache_hits      INTEGER NOT NULL DEFAULT 0,
+            last_active     TEXT,
+            rebuilt_at      TEXT
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def init_content_db():
+    conn = get_content_db()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS extracted_text (
+            sha256        TEXT    PRIMARY KEY,
+            text          TEXT    NOT NULL,
+            page_offsets  TEXT    NOT NULL,
+            num_pages     INTEGER NOT NULL,
+            created_at    TEXT    DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chunks (
+            sha256   TEXT    NOT NULL,
+            chunker  TEXT    NOT NULL,
+            idx      INTEGER NOT NULL,
+            text     TEXT    NOT NULL,
+            PRIMARY KEY (sha256, chunker, idx)
+        )
+    """)
+    # ── Reference counts for blobs/ (one per user pdfs row pointing at it) ──
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256      TEXT    PRIMARY KEY,
+            size_bytes  INTEGER NOT NULL,
+            refcount    INTEGER NOT NULL DEFAULT 0,
+            created_at  TEXT    DEFAULT (datetime('now'))
+        )
+    """)
+    # ── Generated questions per chunk text, reused by any request size ──
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_questions (
+            id             INTEGER PRIMARY KEY AUTOINCREMENT,
+            chunk_hash     TEXT    NOT NULL,
+            difficulty     TEXT    NOT NULL,
+            question_json  TEXT    NOT NULL,
+            created_at     TEXT    DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_questions ON chunk_questions (chunk_hash, difficulty, id)")
     conn.commit()
     conn.close()
 
 def init_user_db(user_id: int):
-    conn = get_user_db(user_id)
+    _ready_users.discard(user_id)
+    get_user_db(user_id).close()
+
+def _create_user_schema(conn):
     conn.execute("""
         CREATE TABLE IF NOT EXISTS pdfs (
             id          INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -71,10 +324,120 @@ def init_user_db(user_id: int):
             pdf_id         INTEGER NOT NULL REFERENCES pdfs(id) ON DELETE CASCADE,
             num_questions  INTEGER NOT NULL,
             difficulty     TEXT    NOT NULL,
-            quiz_json      TEXT    NOT NULL,
+            quiz_json      TEXT    NOT NULL DEFAULT '',
             created_at     TEXT    DEFAULT (datetime('now')),
             UNIQUE(pdf_id, num_questions, difficulty)
         )
     """)
+    # ── Question bank: pre-generated questions sampled into quizzes ──
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id             INTEGER PRIMARY KEY AUTOINCREMENT,
+            pdf_id         INTEGER NOT NULL REFERENCES pdfs(id) ON DELETE CASCADE,
+            difficulty     TEXT    NOT NULL,
+            question_json  TEXT    NOT NULL,
+            seen_at        TEXT,
+            created_at     TEXT    DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_question_bank ON question_bank (pdf_id, difficulty, seen_at)")
+    # ── Full-text index over PDF chunks, see search.py ──
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunk_index USING fts5(text, tokenize='porter unicode61')")
+    # ── Quiz history (append-only) and incrementally maintained rollups, see progress.py ──
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            pdf_id              INTEGER NOT NULL,
+            difficulty          TEXT,
+            questions_answered  INTEGER NOT NULL,
+            questions_correct   INTEGER NOT NULL,
+            score_pct           INTEGER NOT NULL,
+            finished_at         TEXT    NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_pdf ON sessions (pdf_id, finished_at)")
+    # Unfiltered history pages (ORDER BY finished_at DESC, id DESC) walk this one without a sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_finished ON sessions (finished_at DESC, id DESC)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day       TEXT    PRIMARY KEY,
+            sessions  INTEGER NOT NULL DEFAULT 0,
+            answered  INTEGER NOT NULL DEFAULT 0,
+            correct   INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS difficulty_stats (
+            difficulty  TEXT    PRIMARY KEY,
+            sessions    INTEGER NOT NULL DEFAULT 0,
+            answered    INTEGER NOT NULL DEFAULT 0,
+            correct     INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS study_stats (
+            id              INTEGER PRIMARY KEY CHECK (id = 1),
+            sessions        INTEGER NOT NULL DEFAULT 0,
+            answered        INTEGER NOT NULL DEFAULT 0,
+            correct         INTEGER NOT NULL DEFAULT 0,
+            current_streak  INTEGER NOT NULL DEFAULT 0,
+            longest_streak  INTEGER NOT NULL DEFAULT 0,
+            last_day        TEXT
+        )
+    """)
+    # ── Migrations ──
+    _add_column(conn, "pdfs", "sha256", "TEXT")
+    _add_column(conn, "pdfs", "ingest_status", "TEXT")
+    _add_column(conn, "pdfs", "pages_processed", "INTEGER DEFAULT 0")
+    _add_column(conn, "pdfs", "num_pages", "INTEGER")
+    _add_column(conn, "pdfs", "ingest_error", "TEXT")
+    _add_column(conn, "pdfs", "blob", "INTEGER DEFAULT 0")   # 1 = file lives in blobs/
+    _add_column(conn, "quiz_cache", "body_gz", "BLOB")        # gzipped response; quiz_json is then ''
+    _compress_quiz_cache(conn)
+    _unique_progress(conn)
+    _version_triggers(conn)
+    # Totals carried over from before session history existed
+    conn.execute("INSERT OR IGNORE INTO study_stats (id, sessions, answered, correct) "
+                 "SELECT 1, COALESCE(SUM(sessions), 0), COALESCE(SUM(total_answered), 0), "
+                 "COALESCE(SUM(total_correct), 0) FROM progress")
     conn.commit()
-    conn.close()
+
+# Tables whose writes change what read endpoints return (see http_cache.py)
+VERSIONED_TABLES = ("pdfs", "progress", "quiz_cache")
+
+def _version_triggers(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            id       INTEGER PRIMARY KEY CHECK (id = 1),
+            version  INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    for table in VERSIONED_TABLES:
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS bump_version_{table}_{op.lower()} AFTER {op} ON {table} "
+                         f"BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END")
+
+def _compress_quiz_cache(conn):
+    """Convert quiz_cache rows written before body_gz existed."""
+    rows = conn.execute("SELECT q.id, q.quiz_json, p.name FROM quiz_cache q LEFT JOIN pdfs p ON p.id = q.pdf_id "
+                        "WHERE q.body_gz IS NULL").fetchall()
+    for r in rows:
+        conn.execute("UPDATE quiz_cache SET body_gz=?, quiz_json='' WHERE id=?",
+                     (cached_quiz_body(json.loads(r["quiz_json"]), r["name"] or ""), r["id"]))
+
+def _unique_progress(conn):
+    """Merge duplicate progress rows (left by the old SELECT-then-INSERT race)
+    so progress.pdf_id can be unique and saves can upsert."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='idx_progress_pdf'").fetchone():
+        return
+    for (pdf_id,) in conn.execute("SELECT pdf_id FROM progress GROUP BY pdf_id HAVING COUNT(*) > 1").fetchall():
+        keep = conn.execute("SELECT id FROM progress WHERE pdf_id=? ORDER BY last_session DESC, id DESC LIMIT 1",
+                            (pdf_id,)).fetchone()[0]
+        conn.execute("""UPDATE progress SET
+            total_answered = (SELECT SUM(total_answered) FROM progress WHERE pdf_id=?),
+            total_correct  = (SELECT SUM(total_correct)  FROM progress WHERE pdf_id=?),
+            sessions       = (SELECT SUM(sessions)       FROM progress WHERE pdf_id=?)
+            WHERE id = ?""", (pdf_id, pdf_id, pdf_id, keep))
+        conn.execute("DELETE FROM progress WHERE pdf_id=? AND id<>?", (pdf_id, keep))
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_progress_pdf ON progress (pdf_id)")
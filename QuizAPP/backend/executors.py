@@ -0,0 +1,107 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+# Dedicated, bounded pools for blocking work so slow PDF parsing and LLM calls
+# never occupy FastAPI's shared threadpool. When a pool's queue is full the
+# request is rejected with Overloaded (-> 503/429 + Retry-After, see main.py)
+# instead of piling up behind it.
+
+class Overloaded(Exception):
+    def __init__(self, detail: str, retry_after: int, status_code: int = 503):
+        super().__init__(detail)
+        self.detail      = detail
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class BoundedExecutor:
+    """Thread (or process) pool that accepts at most workers + queue_size pending jobs."""
+
+    def __init__(self, name: str, workers: int, queue_size: int, retry_after: int, processes: bool = False):
+        self.name        = name
+        self.retry_after = retry_after
+        if processes:
+            # spawn, not fork: the server process is multi-threaded
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded(f"Server busy ({self.name}), try again shortly", self.retry_after)
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+class AdmissionGate:
+    """Caps concurrent holders globally and per key (e.g. per user)."""
+
+    def __init__(self, name: str, limit: int, per_key: int, retry_after: int):
+        self.name        = name
+        self.limit       = limit
+        self.per_key     = per_key
+        self.retry_after = retry_after
+        self._active = 0
+        self._by_key: dict = {}
+        self._lock   = threading.Lock()
+
+    def _check(self, key):
+        if self._by_key.get(key, 0) >= self.per_key:
+            raise Overloaded("Too many quizzes generating at once, wait for one to finish",
+                             self.retry_after, status_code=429)
+        if self._active >= self.limit:
+            raise Overloaded(f"Server busy ({self.name}), try again shortly", self.retry_after)
+
+    def check(self, key):
+        """Raise Overloaded if enter(key) would be refused right now (without entering)."""
+        with self._lock:
+            self._check(key)
+
+    def enter(self, key):
+        with self._lock:
+            self._check(key)
+            self._active += 1
+            self._by_key[key] = self._by_key.get(key, 0) + 1
+
+    def exit(self, key):
+        with self._lock:
+            self._active -= 1
+            if self._by_key[key] <= 1:
+                del self._by_key[key]
+            else:
+                self._by_key[key] -= 1
+
+    def hold(self, key):
+        gate = self
+
+        class _Hold:
+            def __enter__(self):
+                gate.enter(key)
+
+            def __exit__(self, *exc):
+                gate.exit(key)
+
+        return _Hold()
+
+# PDF extraction / chunking (CPU-bound; pages fan out further to the process pool)
+CPU_EXECUTOR  = BoundedExecutor("cpu", int(os.environ.get("CPU_WORKERS", "2")),
+                                int(os.environ.get("CPU_QUEUE", "16")), retry_after=10)
+# SQLite and file I/O from async routes
+IO_EXECUTOR   = BoundedExecutor("io", int(os.environ.get("IO_WORKERS", "8")),
+                                int(os.environ.get("IO_QUEUE", "256")), retry_after=1)
+# bcrypt hashing (CPU-bound, ~250ms per call at cost 12) in separate processes
+HASH_EXECUTOR = BoundedExecutor("hash", int(os.environ.get("HASH_WORKERS", "2")),
+                                int(os.environ.get("HASH_QUEUE", "64")), retry_after=2, processes=True)
+# In-flight LLM generations (the calls themselves run on the quiz engine loop)
+LLM_GATE      = AdmissionGate("llm", int(os.environ.get("LLM_MAX_INFLIGHT", "32")),
+                              int(os.environ.get("LLM_MAX_PER_USER", "2")), retry_after=15)
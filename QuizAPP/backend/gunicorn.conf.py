@@ -0,0 +1,23 @@
+import os
+
+# Multi-process mode: `gunicorn main:app -c gunicorn.conf.py`.
+# Every worker is a full uvicorn app; shared state (auth caches) lives in
+# DATA_DIR/cache.db when WEB_CONCURRENCY > 1, see cache.py.
+bind             = os.environ.get("BIND", "0.0.0.0:8000")
+workers          = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class     = "uvicorn.workers.UvicornWorker"
+timeout          = int(os.environ.get("WORKER_TIMEOUT", "180"))   # long quiz generations
+graceful_timeout = 30
+keepalive        = 5
+accesslog        = "-"
+
+# Each worker builds its own process pools, so split the per-host defaults
+# between workers instead of starting cpu_count() extractors in every one.
+# Values set explicitly in the environment are per worker and left alone.
+# (This file runs in the master before the workers import the app.)
+_cpus = os.cpu_count() or 1
+os.environ.setdefault("PDF_WORKERS",  str(max(1, _cpus // workers)))
+os.environ.setdefault("HASH_WORKERS", str(max(1, 2 // workers)))
+# forwarded_allow_ips stays at its default: trusting "*" would make uvicorn take
+# the client-controlled left-most X-Forwarded-For entry. Login limits resolve
+# the client address themselves, see auth.client_ip / TRUSTED_PROXIES.
@@ -0,0 +1,32 @@
+from fastapi import Request
+from fastapi.responses import Response
+from database import get_user_db
+from serialization import dumps
+
+# Conditional GETs for per-user read endpoints. Triggers on pdfs, progress and
+# quiz_cache bump data_version.version in the user's data.db on every write
+# (see database.py), so a weak ETag built from it changes exactly when the
+# data behind a list can have changed. Matching requests get a 304 after one
+# single-row read instead of running the endpoint's query.
+
+CACHE_CONTROL = "private, no-cache"   # browsers keep the body but revalidate each time
+
+def data_version(user_id: int) -> int:
+    conn = get_user_db(user_id)
+    row  = conn.execute("SELECT version FROM data_version WHERE id=1").fetchone()
+    conn.close()
+    return row["version"] if row else 0
+
+def etag(user_id: int, *parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in (user_id, data_version(user_id), *parts)) + '"'
+
+def not_modified(request: Request, tag: str) -> Response | None:
+    """A 304 response if the client already holds this version, else None."""
+    sent = request.headers.get("if-none-match", "")
+    if sent and (sent.strip() == "*" or tag in [t.strip() for t in sent.split(",")]):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+def json_response(payload, tag: str) -> Response:
+    return Response(dumps(payload), media_type="application/json",
+                    headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,83 @@
+import os
+import time
+import asyncio
+from concurrent.futures import Future
+from database import get_user_db
+from executors import IO_EXECUTOR
+from pdf_parser import iter_pages
+from text_store import get_chunks, load_extracted, save_extracted
+import background
+import question_bank
+import search
+
+# Background ingestion: uploads enqueue a job that extracts and chunks the PDF
+# off the request path, so the first /quiz/generate finds everything ready.
+PROGRESS_EVERY      = 10   # pages between pages_processed updates
+WAIT_TIMEOUT        = float(os.environ.get("INGEST_WAIT_TIMEOUT", "120"))
+WAIT_POLL_SECONDS   = 0.25
+
+def _set_status(user_id: int, pdf_id: int, status: str, pages: int, num_pages: int | None = None,
+                error: str | None = None):
+    conn = get_user_db(user_id)
+    conn.execute(
+        "UPDATE pdfs SET ingest_status=?, pages_processed=?, num_pages=COALESCE(?, num_pages), "
+        "ingest_error=? WHERE id=?",
+        (status, pages, num_pages, error, pdf_id)
+    )
+    conn.commit()
+    conn.close()
+
+def _ingest(user_id: int, pdf_id: int, pdf_path: str, sha256: str):
+    try:
+        stored = load_extracted(sha256)
+        if stored is None:
+            pages = []
+            for page_text in iter_pages(pdf_path):
+                pages.append(page_text)
+                if len(pages) % PROGRESS_EVERY == 0:
+                    _set_status(user_id, pdf_id, "pending", len(pages))
+            stored = save_extracted(sha256, pages)
+        chunks    = get_chunks(pdf_path, sha256)
+        search.index_pdf(user_id, pdf_id, chunks)
+        num_pages = len(stored[1])
+        _set_status(user_id, pdf_id, "ready", num_pages, num_pages)
+    except Exception as e:
+        _set_status(user_id, pdf_id, "failed", 0, error=str(e)[:500])
+        return
+    for difficulty in question_bank.FILL_ON_INGEST:
+        question_bank.schedule_fill(user_id, pdf_id, difficulty, lambda: chunks)
+
+def enqueue(user_id: int, pdf_id: int, pdf_path: str, sha256: str) -> Future:
+    return background.submit(("ingest", user_id, pdf_id), _ingest, user_id, pdf_id, pdf_path, sha256)
+
+def _pending(user_id: int, pdf_id: int) -> bool:
+    conn = get_user_db(user_id)
+    row  = conn.execute("SELECT ingest_status FROM pdfs WHERE id=?", (pdf_id,)).fetchone()
+    conn.close()
+    return bool(row) and row["ingest_status"] == "pending"
+
+def wait(user_id: int, pdf_id: int, timeout: float | None = WAIT_TIMEOUT):
+    """Block until an in-flight ingestion of this PDF (if any) has finished.
+
+    The job may be running in another gunicorn worker, so besides this
+    worker's own job the persisted ingest_status is polled. Raises
+    TimeoutError if it is still pending after timeout seconds (e.g. the
+    worker running it died)."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    background.wait(("ingest", user_id, pdf_id), timeout)
+    while _pending(user_id, pdf_id):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"PDF {pdf_id} is still being processed")
+        time.sleep(WAIT_POLL_SECONDS)
+
+async def wait_async(user_id: int, pdf_id: int, timeout: float = WAIT_TIMEOUT):
+    """wait() for async routes: awaits the job and polls without holding a thread."""
+    deadline = time.monotonic() + timeout
+    job      = background.ingestion.job(("ingest", user_id, pdf_id))
+    if job is not None:
+        # shield: a timeout here must not cancel the queued ingestion itself
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job)), timeout)
+    while await IO_EXECUTOR.run(_pending, user_id, pdf_id):
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"PDF {pdf_id} is still being processed")
+        await asyncio.sleep(WAIT_POLL_SECONDS)
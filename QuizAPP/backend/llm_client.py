@@ -0,0 +1,197 @@
+import os
+import math
+import time
+import random
+import asyncio
+import collections
+import functools
+from email.utils import parsedate_to_datetime
+from executors import Overloaded
+from metrics import LLM_EVENTS
+
+# Resilience wrapper around the OpenAI async client (constructed with
+# max_retries=0 so this is the only retry layer):
+#   - a deadline for the whole call plus a timeout per attempt
+#   - full-jitter exponential backoff on 429 / 5xx / timeouts / connection
+#     errors, never sooner than the server's Retry-After
+#   - optional hedging: when an attempt outlives the observed p95 latency a
+#     duplicate is sent and the first success wins (costs extra tokens)
+#   - a circuit breaker that fails calls fast while the upstream is failing
+# Exhausted retries and an open circuit raise LLMUnavailable (an Overloaded,
+# so clients get 503 + Retry-After, see main.py).
+
+LLM_DEADLINE_SECS   = float(os.environ.get("LLM_DEADLINE", "120"))
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get("LLM_ATTEMPT_TIMEOUT", "60"))
+LLM_MAX_ATTEMPTS    = int(os.environ.get("LLM_MAX_ATTEMPTS", "4"))
+LLM_BACKOFF_BASE    = 0.5
+LLM_BACKOFF_MAX     = 10.0
+LLM_HEDGE           = os.environ.get("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_SAMPLES = 20            # latencies observed before hedging starts
+LLM_BREAKER_FAILURES  = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN  = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+@functools.cache
+def _errors() -> tuple[tuple, type]:
+    """(retryable exception types, rate-limit type); openai is imported on first call."""
+    import openai
+    return ((openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError, asyncio.TimeoutError),
+            openai.RateLimitError)
+
+class LLMUnavailable(Overloaded):
+    pass
+
+def retry_after(exc: Exception) -> float | None:
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        if ms := response.headers.get("retry-after-ms"):
+            return float(ms) / 1000
+        if value := response.headers.get("retry-after"):
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive upstream failures; after `cooldown`
+    seconds one probe call is let through, and its outcome closes or re-opens it.
+    Calls arriving while the probe is in flight wait for its verdict rather than
+    failing, so sibling chunks of a quiz don't fail (and cancel the probe)."""
+
+    def __init__(self, failures: int, cooldown: float):
+        self.failures  = failures
+        self.cooldown  = cooldown
+        self._count    = 0
+        self._opened   = None
+        self._probe    = None     # asyncio.Event of the in-flight probe
+
+    @property
+    def state(self) -> str:
+        if self._opened is None:
+            return "closed"
+        return "half_open" if self._probe is not None else "open"
+
+    async def acquire(self) -> asyncio.Event | None:
+        """Raise LLMUnavailable while open. Returns the probe token when the caller
+        is the half-open probe; it must be passed to success(), failure() or abandon()."""
+        while self._probe is not None:
+            await self._probe.wait()
+        if self._opened is None:
+            return None
+        remaining = self._opened + self.cooldown - time.monotonic()
+        if remaining > 0:
+            raise LLMUnavailable("Quiz generation is temporarily unavailable, try again shortly",
+                                 retry_after=max(1, math.ceil(remaining)))
+        self._probe = asyncio.Event()
+        return self._probe
+
+    def _end_probe(self, probe: asyncio.Event | None):
+        if probe is not None and probe is self._probe:
+            self._probe = None
+            probe.set()
+
+    def success(self, probe: asyncio.Event | None = None):
+        self._count, self._opened = 0, None
+        self._end_probe(probe)
+
+    def failure(self, probe: asyncio.Event | None = None):
+        self._count += 1
+        probing = probe is not None and probe is self._probe
+        if probing or self._count >= self.failures:
+            if self._opened is None or probing:
+                LLM_EVENTS.inc(event="circuit_open")
+            self._opened = time.monotonic()
+        self._end_probe(probe)
+
+    def abandon(self, probe: asyncio.Event | None):
+        """The probe ended without a verdict (cancelled, rate limited, non-retryable
+        error): re-open for another cooldown instead of staying half-open."""
+        if probe is not None and probe is self._probe and self._opened is not None:
+            self._opened = time.monotonic()
+        self._end_probe(probe)
+
+class ResilientClient:
+    def __init__(self, client, deadline: float = LLM_DEADLINE_SECS, attempt_timeout: float = LLM_ATTEMPT_TIMEOUT,
+                 max_attempts: int = LLM_MAX_ATTEMPTS, hedge: bool = LLM_HEDGE,
+                 breaker: CircuitBreaker | None = None):
+        self.client          = client
+        self.deadline        = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts    = max_attempts
+        self.hedge           = hedge
+        self.breaker         = breaker or CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN)
+        self._latencies      = collections.deque(maxlen=200)
+
+    def hedge_delay(self) -> float | None:
+        """Observed p95 attempt latency, once there are enough samples."""
+        if len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95)]
+
+    async def _attempt(self, timeout: float, kwargs: dict):
+        create = self.client.chat.completions.create
+        delay  = self.hedge_delay() if self.hedge else None
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(create(**kwargs), timeout)
+        first = asyncio.ensure_future(create(**kwargs))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                LLM_EVENTS.inc(event="hedge")
+                tasks.add(asyncio.ensure_future(create(**kwargs)))
+            ends  = time.monotonic() + timeout - (0 if done else delay)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, timeout=max(0, ends - time.monotonic()),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (first, *tasks):
+                task.cancel()
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        jitter = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        return max(jitter, retry_after(exc) or 0)
+
+    async def chat(self, **kwargs):
+        """chat.completions.create(**kwargs) with deadlines, retries, hedging and circuit breaking."""
+        retryable, rate_limited = _errors()
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            probe = await self.breaker.acquire()
+            start = time.monotonic()
+            try:
+                response = await self._attempt(min(self.attempt_timeout, deadline - start), kwargs)
+            except retryable as e:
+                if isinstance(e, rate_limited):
+                    self.breaker.abandon(probe)
+                else:
+                    self.breaker.failure(probe)
+                error = e
+            except BaseException:
+                self.breaker.abandon(probe)
+                raise
+            else:
+                self.breaker.success(probe)
+                self._latencies.append(time.monotonic() - start)
+                return response
+            wait = self._backoff(attempt, error)
+            if attempt + 1 >= self.max_attempts or time.monotonic() + wait >= deadline:
+                LLM_EVENTS.inc(event="gave_up")
+                raise LLMUnavailable("Quiz generation is temporarily unavailable, try again shortly",
+                                     retry_after=max(1, math.ceil(wait))) from error
+            LLM_EVENTS.inc(event="retry")
+            await asyncio.sleep(wait)
@@ -1,8 +1,25 @@
-from fastapi import FastAPI
+import os
+import threading
+import hmac
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+import payment
 from payment import router as payment_router
-from database import init_main_db
+from database import init_main_db, init_content_db
+from executors import Overloaded
+from metrics import MetricsMiddleware, render as render_metrics
+from compression import CompressionMiddleware
 from routes import auth, pdfs, quiz
+from quiz_generator import get_llm
+from pdf_parser import count_tokens
+
+# pdfplumber, openai, razorpay and the tiktoken encoding load on first use to
+# keep worker start fast; WARMUP=1 loads them (and creates the clients) in the
+# background at startup
+WARMUP = os.environ.get("WARMUP", "0") == "1"
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
 
 app = FastAPI(title="MedQuiz AI API")
 app.include_router(payment_router)
@@ -14,10 +31,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(Overloaded)
+def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+def warm_up():
+    import pdfplumber  # noqa: F401
+    count_tokens("")       # resolves the tiktoken encoding
+    payment.get_client()
+    if os.environ.get("OPENAI_API_KEY"):
+        get_llm()
 
 @app.on_event("startup")
 def startup():
     init_main_db()
+    init_content_db()
+    if WARMUP:
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
 
 app.include_router(auth.router)
 app.include_router(pdfs.router)
@@ -26,3 +60,11 @@ app.include_router(quiz.router)
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Prometheus text exposition of request, generation, OpenAI and DB metrics."""
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("authorization", ""),
+                                                 f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(401, "Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
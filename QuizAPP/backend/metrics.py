@@ -0,0 +1,160 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from database import pool_stats
+
+# Minimal Prometheus-style metrics (text exposition format 0.0.4), served at
+# /metrics by main.py. Values are per process: with several gunicorn workers
+# every series carries a `worker` label so scrapes of different workers
+# don't look like counter resets.
+
+WORKER_LABEL = (("worker", str(os.getpid())),) if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 else ()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry: list = []
+
+def _labels(pairs) -> str:
+    pairs = WORKER_LABEL + tuple(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def _fmt(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name   = name
+        self.help   = help
+        self.labels = labels
+        self._values: dict = {}
+        self._lock  = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple((k, str(labels.get(k, ""))) for k in self.labels)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self.samples():
+            lines.append(f"{name}{_labels(key)} {_fmt(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """A gauge set directly, or computed at scrape time by fn() -> {labels tuple: value}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None):
+        super().__init__(name, help, labels)
+        self._fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self._fn is None:
+            return super().samples()
+        return [(self.name, tuple(zip(self.labels, key)), value) for key, value in self._fn().items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # per-bucket counts (last = +Inf), then sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        out = []
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                out.append((f"{self.name}_bucket", key + (("le", _fmt(bound)),), cumulative))
+            out.append((f"{self.name}_sum", key, counts[-1]))
+            out.append((f"{self.name}_count", key, cumulative))
+        return out
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ── Application metrics ────────────────────────────────────────
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template",
+                         ("method", "route", "status"))
+GENERATE_STAGE = Histogram("quiz_generate_stage_seconds",
+                           "Time spent in each stage of quiz generation", ("stage",))
+QUIZ_CACHE = Counter("quiz_cache_requests_total",
+                     "Generate requests by where the quiz came from (bank, cache or miss)", ("result",))
+OPENAI_LATENCY = Histogram("openai_request_duration_seconds", "OpenAI chat completion latency",
+                           ("model", "outcome"))
+OPENAI_TOKENS = Counter("openai_tokens_total", "OpenAI tokens used", ("model", "kind"))
+LLM_EVENTS = Counter("llm_client_events_total", "LLM client retries, hedged requests and circuit-breaker trips",
+                     ("event",))
+DB_CONNECTIONS = Gauge("db_connections", "Pooled SQLite connections by database and state",
+                       ("db", "state"), fn=pool_stats)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template (e.g.
+    /pdfs/{pdf_id}), so path parameters don't explode the label space."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start  = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"],
+                                 route=getattr(route, "path", "unmatched"), status=status)
@@ -0,0 +1,26 @@
+import os
+from passlib.context import CryptContext
+
+# Password hashing, kept free of app imports: it runs in the HASH_EXECUTOR
+# process pool (see executors.py) so bcrypt never occupies request threads.
+
+# bcrypt cost factor. Hashes made with any other cost are rehashed on the
+# user's next successful login, so it can be raised (or lowered) at any time.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS,
+                       bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS)
+
+def hash_password(password: str) -> str:
+    return pwd_ctx.hash(password)
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return pwd_ctx.verify(plain, hashed)
+
+def verify_and_update(plain: str, hashed: str | None) -> tuple[bool, str | None]:
+    """(valid, new hash if the stored one should be replaced). With no stored
+    hash (unknown user) a dummy hash is checked so timing doesn't reveal it."""
+    if hashed is None:
+        pwd_ctx.dummy_verify()
+        return False, None
+    return pwd_ctx.verify_and_update(plain, hashed)
@@ -12,7 +12,7 @@ Environment Variables (add to .env):
 """
 
 import os
-import razorpay
+import threading
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional
@@ -20,12 +20,33 @@ import hmac
 import hashlib
 
 # ─────────────────────────────────────────────
-# Initialize Razorpay Client
+# Razorpay Client (created on first use)
 # ─────────────────────────────────────────────
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "rzp_test_xxxxxxxxxxxx")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "your_secret_key")
 
-client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The shared Razorpay client. The razorpay package is only imported
+    when the first payment request needs it, keeping app startup fast.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import razorpay
+                _client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+    return _client
+
+
+def set_client(client):
+    """Use `client` for all payment calls (e.g. a fake in tests); None restores the default."""
+    global _client
+    _client = client
 
 router = APIRouter(prefix="/payment", tags=["Payment"])
 
@@ -75,7 +96,7 @@ async def create_order(order_req: OrderRequest):
             "receipt": order_req.receipt or f"order_{os.urandom(8).hex()}",
             "notes": order_req.notes or {},
         }
-        order = client.order.create(data=order_data)
+        order = get_client().order.create(data=order_data)
         return {
             "status": "success",
             "order_id": order["id"],
@@ -132,7 +153,7 @@ async def create_plan():
     """
     try:
         # Monthly Plan
-        monthly_plan = client.plan.create({
+        monthly_plan = get_client().plan.create({
             "period": "monthly",
             "interval": 1,
             "item": {
@@ -144,7 +165,7 @@ async def create_plan():
         })
 
         # Yearly Plan
-        yearly_plan = client.plan.create({
+        yearly_plan = get_client().plan.create({
             "period": "yearly",
             "interval": 1,
             "item": {
@@ -170,7 +191,7 @@ async def create_subscription(sub_req: SubscriptionRequest):
     Create a subscription for a user.
     """
     try:
-        subscription = client.subscription.create({
+        subscription = get_client().subscription.create({
             "plan_id": sub_req.plan_id,
             "total_count": sub_req.total_count,
             "notes": sub_req.notes or {},
@@ -1,27 +1,165 @@
-import pdfplumber
+import os
+import re
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_pdf(file_path: str) -> str:
-    text_parts = []
+# ── Chunking ───────────────────────────────────────────────────
+# Chunks are budgeted in model tokens (tiktoken when installed, otherwise a
+# ~4 chars/token estimate) so every generate call has a predictable prompt size.
+CHUNK_TOKENS         = int(os.environ.get("CHUNK_TOKENS", "3000"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "0"))
+TOKEN_MODEL          = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+
+@functools.cache
+def _encoding():
+    """Resolved on first use, not at import: loading an encoding may download
+    its BPE file, which must not happen while the app starts."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(TOKEN_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:   # not installed, or encoding files unavailable offline
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def chunker() -> str:
+    """Identifies the chunking scheme; stored chunks are keyed by it."""
+    return f"tokens-{'tiktoken' if _encoding() else 'est'}-{CHUNK_TOKENS}-{CHUNK_OVERLAP_TOKENS}"
+
+# ── Parallel extraction ────────────────────────────────────────
+# pdfplumber is CPU-bound pure Python, so large PDFs are split into page
+# ranges and extracted in worker processes. Small PDFs stay serial: below
+# PDF_PARALLEL_MIN_PAGES the pool overhead outweighs the gain.
+PDF_WORKERS            = int(os.environ.get("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_SHARD    = int(os.environ.get("PDF_PAGES_PER_SHARD", "20"))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "40"))
+
+_pools: dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn, not fork: the server process is multi-threaded
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+# pdfplumber (and pdfminer under it) is imported on first use, not at startup
+def count_pages(file_path: str) -> int:
+    import pdfplumber
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-    return "\n\n".join(text_parts)
-
-def chunk_text(text: str, max_chars: int = 6000) -> list[str]:
-    if len(text) <= max_chars:
+        return len(pdf.pages)
+
+def _extract_range(file_path: str, start: int, stop: int) -> list[str]:
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:stop]]
+
+def iter_pages(file_path: str, workers: int | None = None):
+    """Yield each page's text (empty string for blank pages) in page order,
+    as soon as the shard containing it has been extracted."""
+    workers   = workers or PDF_WORKERS
+    num_pages = count_pages(file_path)
+    if workers <= 1 or num_pages < PDF_PARALLEL_MIN_PAGES:
+        for start in range(0, num_pages, PDF_PAGES_PER_SHARD):
+            yield from _extract_range(file_path, start, min(start + PDF_PAGES_PER_SHARD, num_pages))
+        return
+    pool   = _get_pool(workers)
+    shards = [pool.submit(_extract_range, file_path, start, min(start + PDF_PAGES_PER_SHARD, num_pages))
+              for start in range(0, num_pages, PDF_PAGES_PER_SHARD)]
+    try:
+        for shard in shards:
+            yield from shard.result()
+    finally:
+        for shard in shards:
+            shard.cancel()
+
+def extract_pages(file_path: str, workers: int | None = None) -> list[str]:
+    return list(iter_pages(file_path, workers))
+
+def join_pages(pages: list[str]) -> tuple[str, list[int]]:
+    """Join non-empty pages with blank lines; returns (text, start offset of every page)."""
+    text_parts, offsets, pos = [], [], 0
+    for page_text in pages:
+        if page_text and text_parts:
+            pos += 2
+        offsets.append(pos)
+        if page_text:
+            text_parts.append(page_text)
+            pos += len(page_text)
+    return "\n\n".join(text_parts), offsets
+
+def extract_text_from_pdf(file_path: str) -> str:
+    return join_pages(extract_pages(file_path))[0]
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+def _split_oversized(para: str, max_tokens: int) -> list[tuple[str, int]]:
+    """Split a paragraph over budget into sentence-sized pieces, hard-splitting
+    any single sentence that is still too long."""
+    pieces = []
+    for sentence in SENTENCE_RE.split(para):
+        tokens = count_tokens(sentence)
+        if tokens <= max_tokens:
+            pieces.append((sentence, tokens))
+            continue
+        step = max(1, len(sentence) * max_tokens // tokens)
+        for start in range(0, len(sentence), step):
+            part = sentence[start:start + step]
+            pieces.append((part, count_tokens(part)))
+    return pieces
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """Pack paragraphs greedily into chunks of at most max_tokens; paragraphs
+    over budget fall back to sentence splitting. With overlap_tokens, each chunk
+    starts with the tail of the previous one. Linear in the length of text."""
+    if count_tokens(text) <= max_tokens:
         return [text]
-    chunks = []
-    paragraphs = text.split("\n\n")
-    current_chunk = ""
-    for para in paragraphs:
-        if len(current_chunk) + len(para) + 2 > max_chars:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = para
+
+    # (text, tokens, separator before it): sentence pieces of one paragraph
+    # are rejoined with a space, paragraphs with a blank line
+    units = []
+    for para in text.split("\n\n"):
+        para = para.strip()
+        if not para:
+            continue
+        tokens = count_tokens(para)
+        if tokens <= max_tokens:
+            units.append((para, tokens, "\n\n"))
         else:
-            current_chunk += "\n\n" + para
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+            units.extend((piece, t, "\n\n" if i == 0 else " ")
+                         for i, (piece, t) in enumerate(_split_oversized(para, max_tokens)))
+
+    chunks, current, used = [], [], 0
+    for unit in units:
+        if current and used + unit[1] + 1 > max_tokens:
+            chunks.append(_join_units(current))
+            carried, carried_tokens = [], 0
+            for prev in reversed(current):
+                if carried_tokens + prev[1] + 1 > min(overlap_tokens, max_tokens - unit[1] - 1):
+                    break
+                carried.append(prev)
+                carried_tokens += prev[1] + 1
+            current, used = carried[::-1], carried_tokens
+        current.append(unit)
+        used += unit[1] + 1
+    if current:
+        chunks.append(_join_units(current))
     return chunks
+
+def _join_units(units: list[tuple[str, int, str]]) -> str:
+    parts = [units[0][0]]
+    for text, _, sep in units[1:]:
+        parts.append(sep)
+        parts.append(text)
+    return "".join(parts)
@@ -0,0 +1,110 @@
+import time
+from database import get_user_db
+import analytics
+
+# Quiz results: every save appends a row to `sessions` (history) and, in the
+# same transaction, bumps the per-PDF totals in `progress` and the rollups
+# (daily_stats, difficulty_stats, study_stats with streaks). Dashboards read
+# only the rollups, so they cost the same after ten sessions or ten thousand.
+# Days are UTC.
+
+DASHBOARD_DAYS = 30
+
+def _accuracy(answered: int, correct: int) -> float | None:
+    return round(correct * 100 / answered, 1) if answered else None
+
+def record_session(user_id: int, pdf_id: int, pdf_name: str, answered: int, correct: int,
+                   score_pct: int, difficulty: str | None = None):
+    finished_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    day         = finished_at[:10]
+    conn = get_user_db(user_id)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO sessions (pdf_id, difficulty, questions_answered, questions_correct, score_pct, finished_at) "
+            "VALUES (?,?,?,?,?,?)", (pdf_id, difficulty, answered, correct, score_pct, finished_at))
+        conn.execute("""INSERT INTO progress
+            (pdf_id, pdf_name, total_answered, total_correct, sessions, last_score, last_session)
+            VALUES (?,?,?,?,1,?,?)
+            ON CONFLICT(pdf_id) DO UPDATE SET
+                total_answered = total_answered + excluded.total_answered,
+                total_correct  = total_correct  + excluded.total_correct,
+                sessions       = sessions + 1,
+                last_score     = excluded.last_score,
+                last_session   = excluded.last_session""",
+            (pdf_id, pdf_name, answered, correct, score_pct, finished_at))
+        conn.execute("""INSERT INTO daily_stats (day, sessions, answered, correct) VALUES (?,1,?,?)
+            ON CONFLICT(day) DO UPDATE SET
+                sessions = sessions + 1,
+                answered = answered + excluded.answered,
+                correct  = correct  + excluded.correct""", (day, answered, correct))
+        conn.execute("""INSERT INTO difficulty_stats (difficulty, sessions, answered, correct) VALUES (?,1,?,?)
+            ON CONFLICT(difficulty) DO UPDATE SET
+                sessions = sessions + 1,
+                answered = answered + excluded.answered,
+                correct  = correct  + excluded.correct""", (difficulty or "unspecified", answered, correct))
+        # Streak: same day keeps it, the day after extends it, any gap restarts it
+        conn.execute("""INSERT INTO study_stats (id, sessions, answered, correct, current_streak, longest_streak, last_day)
+            VALUES (1,1,?,?,1,1,?)
+            ON CONFLICT(id) DO UPDATE SET
+                sessions       = sessions + 1,
+                answered       = answered + excluded.answered,
+                correct        = correct  + excluded.correct,
+                current_streak = CASE WHEN last_day = excluded.last_day THEN current_streak
+                                      WHEN last_day = date(excluded.last_day, '-1 day') THEN current_streak + 1
+                                      ELSE 1 END,
+                longest_streak = MAX(longest_streak,
+                                     CASE WHEN last_day = excluded.last_day THEN current_streak
+                                          WHEN last_day = date(excluded.last_day, '-1 day') THEN current_streak + 1
+                                          ELSE 1 END),
+                last_day       = excluded.last_day""", (answered, correct, day))
+        conn.commit()
+    finally:
+        conn.close()
+    analytics.record(user_id, sessions=1, answered=answered, correct=correct)
+
+def dashboard(user_id: int, days: int = DASHBOARD_DAYS) -> dict:
+    today = time.strftime("%Y-%m-%d", time.gmtime())
+    conn  = get_user_db(user_id)
+    stats = conn.execute("SELECT *, date(?, '-1 day') AS yesterday FROM study_stats WHERE id=1", (today,)).fetchone()
+    daily = conn.execute("SELECT * FROM daily_stats WHERE day > date(?, ?) ORDER BY day",
+                         (today, f"-{days} days")).fetchall()
+    by_difficulty = conn.execute("SELECT * FROM difficulty_stats ORDER BY difficulty").fetchall()
+    recent = conn.execute("SELECT s.*, p.name AS pdf_name FROM sessions s LEFT JOIN pdfs p ON p.id = s.pdf_id "
+                          "ORDER BY s.id DESC LIMIT 10").fetchall()
+    conn.close()
+
+    active = stats and stats["last_day"] in (today, stats["yesterday"])
+    return {
+        "sessions":       stats["sessions"] if stats else 0,
+        "answered":       stats["answered"] if stats else 0,
+        "correct":        stats["correct"] if stats else 0,
+        "accuracy":       _accuracy(stats["answered"], stats["correct"]) if stats else None,
+        "current_streak": stats["current_streak"] if active else 0,
+        "longest_streak": stats["longest_streak"] if stats else 0,
+        "last_day":       stats["last_day"] if stats else None,
+        "daily":          [{**dict(r), "accuracy": _accuracy(r["answered"], r["correct"])} for r in daily],
+        "by_difficulty":  [{**dict(r), "accuracy": _accuracy(r["answered"], r["correct"])} for r in by_difficulty],
+        "recent":         [dict(r) for r in recent],
+    }
+
+def list_sessions(user_id: int, pdf_id: int | None = None, before: str | None = None,
+                  before_id: int | None = None, limit: int = 50) -> list[dict]:
+    """Newest-first session history; pass the last row's finished_at and id as
+    `before` / `before_id` for the next page (finished_at alone has one-second
+    resolution, so sessions sharing it with the last row would be skipped)."""
+    where, params = [], []
+    if pdf_id is not None:
+        where.append("pdf_id = ?")
+        params.append(pdf_id)
+    if before and before_id is not None:
+        where.append("(finished_at, id) < (?, ?)")
+        params.extend((before, before_id))
+    elif before:
+        where.append("finished_at < ?")
+        params.append(before)
+    sql  = "SELECT * FROM sessions" + (" WHERE " + " AND ".join(where) if where else "")
+    conn = get_user_db(user_id)
+    rows = conn.execute(sql + " ORDER BY finished_at DESC, id DESC LIMIT ?", (*params, limit)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
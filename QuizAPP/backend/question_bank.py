@@ -0,0 +1,70 @@
+import os
+import json
+from database import get_user_db
+from quiz_generator import generate_quiz_from_chunks
+import analytics
+import background
+
+# Per-PDF bank of pre-generated questions in the user's data.db. Quizzes are
+# served by sampling unseen questions (no OpenAI call); a background refill
+# tops the bank up when the unseen pool runs low.
+BANK_SIZE      = int(os.environ.get("QUESTION_BANK_SIZE", "50"))
+BANK_LOW_WATER = int(os.environ.get("QUESTION_BANK_LOW_WATER", "15"))
+# Difficulties to fill at ingestion time, e.g. "easy,medium,hard" (default: on demand only)
+FILL_ON_INGEST = [d for d in os.environ.get("QUESTION_BANK_ON_INGEST", "").split(",") if d]
+
+def bank_counts(user_id: int, pdf_id: int) -> dict:
+    conn = get_user_db(user_id)
+    rows = conn.execute(
+        "SELECT difficulty, COUNT(*) AS total, SUM(seen_at IS NULL) AS unseen "
+        "FROM question_bank WHERE pdf_id=? GROUP BY difficulty", (pdf_id,)
+    ).fetchall()
+    conn.close()
+    return {r["difficulty"]: {"total": r["total"], "unseen": r["unseen"]} for r in rows}
+
+def sample(user_id: int, pdf_id: int, difficulty: str, num_questions: int, load_chunks) -> list[dict] | None:
+    """Take num_questions random unseen questions and mark them seen; None if the
+    bank cannot cover the request. Schedules a refill (load_chunks() supplies the
+    PDF's chunks) once an existing bank runs low."""
+    conn = get_user_db(user_id)
+    conn.execute("BEGIN IMMEDIATE")
+    total, unseen = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(seen_at IS NULL), 0) FROM question_bank WHERE pdf_id=? AND difficulty=?",
+        (pdf_id, difficulty)
+    ).fetchone()
+    rows = []
+    if unseen >= num_questions:
+        rows = conn.execute(
+            "SELECT id, question_json FROM question_bank WHERE pdf_id=? AND difficulty=? AND seen_at IS NULL "
+            "ORDER BY RANDOM() LIMIT ?", (pdf_id, difficulty, num_questions)
+        ).fetchall()
+        conn.executemany("UPDATE question_bank SET seen_at=datetime('now') WHERE id=?",
+                         [(r["id"],) for r in rows])
+    conn.commit()
+    conn.close()
+    if total and unseen - len(rows) < BANK_LOW_WATER:
+        schedule_fill(user_id, pdf_id, difficulty, load_chunks)
+    return [json.loads(r["question_json"]) for r in rows] if rows else None
+
+def fill(user_id: int, pdf_id: int, difficulty: str, chunks: list[str], count: int = BANK_SIZE) -> int:
+    """Generate count questions into the bank. The first fill reuses the shared
+    chunk cache; refills ask for new questions so the bank does not repeat itself."""
+    conn     = get_user_db(user_id)
+    existing = conn.execute("SELECT COUNT(*) FROM question_bank WHERE pdf_id=? AND difficulty=?",
+                            (pdf_id, difficulty)).fetchone()[0]
+    conn.close()
+    quiz = generate_quiz_from_chunks(chunks, num_questions=count, difficulty=difficulty,
+                                     use_cache=existing == 0)
+    conn = get_user_db(user_id)
+    conn.executemany("INSERT INTO question_bank (pdf_id, difficulty, question_json) VALUES (?,?,?)",
+                     [(pdf_id, difficulty, json.dumps(q)) for q in quiz["questions"]])
+    conn.commit()
+    conn.close()
+    analytics.record(user_id, bank_questions=len(quiz["questions"]))
+    return len(quiz["questions"])
+
+def schedule_fill(user_id: int, pdf_id: int, difficulty: str, load_chunks, count: int = BANK_SIZE):
+    """Queue a background fill; load_chunks() is called in the worker."""
+    def job():
+        fill(user_id, pdf_id, difficulty, load_chunks(), count)
+    return background.bank.submit(("bank", user_id, pdf_id, difficulty), job)
@@ -0,0 +1,54 @@
+import os
+import json
+import hashlib
+from database import get_content_db
+
+# Questions generated from a chunk, keyed by (sha256 of the chunk text,
+# difficulty) in content.db. Any quiz size over the same chunks can be served
+# from here, with only the shortfall sent to OpenAI. Only the newest
+# CHUNK_QUESTIONS_CAP questions per key are kept.
+CHUNK_QUESTIONS_CAP = int(os.environ.get("CHUNK_QUESTIONS_CAP", "40"))
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode()).hexdigest()
+
+def load_chunk_questions(hashes: list[str], difficulty: str, limit: int) -> dict[str, list[dict]]:
+    """Up to `limit` stored questions per chunk hash, oldest first."""
+    hashes = list(dict.fromkeys(hashes))
+    if not hashes:
+        return {}
+    conn = get_content_db()
+    rows = conn.execute(
+        f"SELECT chunk_hash, question_json FROM ("
+        f"  SELECT chunk_hash, question_json, id, "
+        f"         ROW_NUMBER() OVER (PARTITION BY chunk_hash ORDER BY id) AS n FROM chunk_questions "
+        f"  WHERE difficulty=? AND chunk_hash IN ({','.join('?' * len(hashes))})"
+        f") WHERE n <= ? ORDER BY id",
+        (difficulty, *hashes, limit)
+    ).fetchall()
+    conn.close()
+    pool: dict[str, list[dict]] = {}
+    for r in rows:
+        pool.setdefault(r["chunk_hash"], []).append(json.loads(r["question_json"]))
+    return pool
+
+def save_chunk_questions(hash_: str, difficulty: str, questions: list[dict]):
+    if not questions:
+        return
+    conn = get_content_db()
+    conn.executemany("INSERT INTO chunk_questions (chunk_hash, difficulty, question_json) VALUES (?,?,?)",
+                     [(hash_, difficulty, json.dumps(q)) for q in questions])
+    conn.execute("DELETE FROM chunk_questions WHERE chunk_hash=? AND difficulty=? AND id NOT IN "
+                 "(SELECT id FROM chunk_questions WHERE chunk_hash=? AND difficulty=? ORDER BY id DESC LIMIT ?)",
+                 (hash_, difficulty, hash_, difficulty, CHUNK_QUESTIONS_CAP))
+    conn.commit()
+    conn.close()
+
+def forget_chunks(hashes: list[str]):
+    """Drop the stored questions of these chunks (all difficulties)."""
+    if not hashes:
+        return
+    conn = get_content_db()
+    conn.execute(f"DELETE FROM chunk_questions WHERE chunk_hash IN ({','.join('?' * len(hashes))})", hashes)
+    conn.commit()
+    conn.close()
@@ -1,11 +1,15 @@
 import os
 import json
-from openai import OpenAI
+import time
+import asyncio
+import threading
 from dotenv import load_dotenv
 from pdf_parser import chunk_text
+from question_cache import chunk_hash, load_chunk_questions, save_chunk_questions
+from metrics import GENERATE_STAGE, OPENAI_LATENCY, OPENAI_TOKENS
+from llm_client import ResilientClient
 
 load_dotenv()
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 
 # ── COST OPTIMIZATION ──────────────────────────────────────────
 # Using gpt-4o-mini instead of gpt-4o
@@ -13,6 +17,9 @@ client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 # That's roughly 15-17x cheaper with nearly identical quiz quality
 MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 
+# Max in-flight chunk completions per quiz
+CONCURRENCY = int(os.environ.get("QUIZ_CONCURRENCY", "5"))
+
 PROMPT_TEMPLATE = """
 You are an expert teacher and quiz designer.
 From the study material below, generate {num_questions} multiple choice questions.
@@ -42,26 +49,186 @@ Study Material:
 {text}
 """
 
-def generate_quiz(text: str, num_questions: int = 5, difficulty: str = "medium") -> dict:
-    chunks   = chunk_text(text, max_chars=6000)
-    all_questions = []
-    questions_per_chunk = max(1, num_questions // len(chunks))
-    remaining = num_questions
-    for i, chunk in enumerate(chunks):
-        if remaining <= 0:
-            break
-        q_count  = questions_per_chunk if i < len(chunks) - 1 else remaining
-        q_count  = min(q_count, remaining)
-        prompt   = PROMPT_TEMPLATE.format(num_questions=q_count, difficulty=difficulty, text=chunk)
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=4000,
-            response_format={"type": "json_object"},
-        )
+# ── Engine loop ────────────────────────────────────────────────
+# All LLM calls run on one long-lived event loop in a daemon thread, so the
+# async client keeps its connection pool across requests and sync callers
+# (FastAPI threadpool endpoints) can simply block on the result.
+_loop      = None
+_loop_lock = threading.Lock()
+
+def _engine_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="quiz-engine", daemon=True).start()
+    return _loop
+
+def run_in_engine(coro):
+    """Schedule a coroutine on the engine loop and return a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _engine_loop())
+
+_DONE = object()
+
+async def stream_from_engine(agen):
+    """Iterate an async generator on the engine loop from another event loop
+    (e.g. a streaming endpoint); closing this iterator cancels the work."""
+    loop  = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+            loop.call_soon_threadsafe(queue.put_nowait, (_DONE, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (_DONE, e))
+
+    future = run_in_engine(pump())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+# ── LLM client ─────────────────────────────────────────────────
+# Created on first use, so importing this module neither loads the openai
+# package nor needs OPENAI_API_KEY; set_llm() swaps in another client.
+_llm      = None
+_llm_lock = threading.Lock()
+
+def get_llm() -> ResilientClient:
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from openai import AsyncOpenAI
+                api_key = os.environ.get("OPENAI_API_KEY")
+                if not api_key:
+                    raise RuntimeError("OPENAI_API_KEY is not set")
+                # Retries, timeouts and circuit breaking are handled by llm_client, not the SDK
+                _llm = ResilientClient(AsyncOpenAI(api_key=api_key, max_retries=0))
+    return _llm
+
+def set_llm(llm: ResilientClient | None):
+    """Use `llm` for all completions (tests, benchmarks); None restores the default on next use."""
+    global _llm
+    _llm = llm
+
+# ── Generation ─────────────────────────────────────────────────
+def allocate_questions(num_questions: int, num_chunks: int) -> list[int]:
+    """Split num_questions across chunks; with more chunks than questions,
+    pick evenly spaced chunks so the quiz covers the whole document."""
+    if num_chunks > num_questions:
+        counts = [0] * num_chunks
+        for i in range(num_questions):
+            counts[i * num_chunks // num_questions] = 1
+        return counts
+    base, extra = divmod(num_questions, num_chunks)
+    return [base + (1 if i < extra else 0) for i in range(num_chunks)]
+
+async def _complete_chunk(chunk: str, q_count: int, difficulty: str, sem: asyncio.Semaphore) -> list[dict]:
+    prompt = PROMPT_TEMPLATE.format(num_questions=q_count, difficulty=difficulty, text=chunk)
+    async with sem:
+        start   = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await get_llm().chat(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=4000,
+                response_format={"type": "json_object"},
+            )
+            outcome = "ok"
+        finally:
+            OPENAI_LATENCY.observe(time.perf_counter() - start, model=MODEL, outcome=outcome)
+    if response.usage:
+        OPENAI_TOKENS.inc(response.usage.prompt_tokens, model=MODEL, kind="prompt")
+        OPENAI_TOKENS.inc(response.usage.completion_tokens, model=MODEL, kind="completion")
+    with GENERATE_STAGE.time(stage="parse"):
         parsed = json.loads(response.choices[0].message.content)
-        questions = parsed.get("questions", [])
-        all_questions.extend(questions)
-        remaining -= len(questions)
+    return parsed.get("questions", [])[:q_count]
+
+async def _as_completed(coros):
+    """Yield coroutine results as they finish, cancelling the rest on early exit."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def iter_chunk_questions(chunks: list[str], num_questions: int = 5, difficulty: str = "medium",
+                               concurrency: int | None = None, use_cache: bool = True):
+    """Yield (chunk index, questions) as soon as each chunk's questions are available:
+    cached ones first, then each completion as it is parsed. At most num_questions
+    are yielded in total; shortfalls are topped up at the end."""
+    counts = allocate_questions(num_questions, len(chunks))
+    sem    = asyncio.Semaphore(concurrency or CONCURRENCY)
+    hashes = [chunk_hash(c) for c in chunks]
+    pool   = await asyncio.to_thread(load_chunk_questions, hashes, difficulty, num_questions) if use_cache else {}
+
+    async def run(i: int, q_count: int):
+        qs = await _complete_chunk(chunks[i], q_count, difficulty, sem)
+        await asyncio.to_thread(save_chunk_questions, hashes[i], difficulty, qs)
+        return i, qs
+
+    # ── Serve what the chunk cache already holds ──
+    # Pools are consumed, so chunks with identical text never repeat a question.
+    produced, jobs = 0, []
+    for i, count in enumerate(counts):
+        have = pool.get(hashes[i], [])[:count]
+        if have:
+            del pool[hashes[i]][:len(have)]
+            produced += len(have)
+            yield i, have
+        if count > len(have):
+            jobs.append((i, count - len(have)))
+    spare = [(hashes.index(h), q) for h, qs in pool.items() for q in qs]
+
+    async for i, qs in _as_completed(run(i, c) for i, c in jobs):
+        produced += len(qs)
+        yield i, qs
+
+    # ── Top up any shortfall: unused cached questions first, then the model ──
+    shortfall = num_questions - produced
+    if shortfall > 0 and spare:
+        by_chunk: dict[int, list[dict]] = {}
+        for i, q in spare[:shortfall]:
+            by_chunk.setdefault(i, []).append(q)
+        for i, qs in by_chunk.items():
+            shortfall -= len(qs)
+            yield i, qs
+    if shortfall > 0:
+        targets = [i for i, c in enumerate(counts) if c > 0]
+        extra   = [(i, c) for i, c in zip(targets, allocate_questions(shortfall, len(targets))) if c > 0]
+        async for i, qs in _as_completed(run(i, c) for i, c in extra):
+            yield i, qs
+
+async def generate_quiz_from_chunks_async(chunks: list[str], num_questions: int = 5, difficulty: str = "medium",
+                                          concurrency: int | None = None, use_cache: bool = True) -> dict:
+    per_chunk: dict[int, list[dict]] = {}
+    async for i, qs in iter_chunk_questions(chunks, num_questions, difficulty, concurrency, use_cache):
+        per_chunk.setdefault(i, []).extend(qs)
+    all_questions = [q for i in sorted(per_chunk) for q in per_chunk[i]]
     return {"questions": all_questions[:num_questions]}
+
+async def generate_quiz_async(text: str, num_questions: int = 5, difficulty: str = "medium",
+                              concurrency: int | None = None, use_cache: bool = True) -> dict:
+    return await generate_quiz_from_chunks_async(chunk_text(text), num_questions, difficulty, concurrency, use_cache)
+
+def generate_quiz_from_chunks(chunks: list[str], num_questions: int = 5, difficulty: str = "medium",
+                              concurrency: int | None = None, use_cache: bool = True) -> dict:
+    return run_in_engine(
+        generate_quiz_from_chunks_async(chunks, num_questions, difficulty, concurrency, use_cache)).result()
+
+def generate_quiz(text: str, num_questions: int = 5, difficulty: str = "medium",
+                  concurrency: int | None = None, use_cache: bool = True) -> dict:
+    return run_in_engine(generate_quiz_async(text, num_questions, difficulty, concurrency, use_cache)).result()
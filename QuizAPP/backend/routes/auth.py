@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from database import get_main_db, init_user_db
-from auth import hash_password, verify_password, create_token, get_current_user, require_admin
+from database import get_main_db, init_user_db, evict_user_db
+from executors import HASH_EXECUTOR, IO_EXECUTOR
+from passwords import hash_password, verify_and_update
+import analytics
+import background
+import blob_store
+from auth import (create_token, get_current_user, require_admin, invalidate_user, cache_stats,
+                  check_login_rate, record_login_failure, clear_login_failures, client_ip)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -11,17 +17,14 @@ class SignupRequest(BaseModel):
     email: str
     password: str
 
-@router.post("/signup")
-def signup(body: SignupRequest):
-    if len(body.password) < 6:
-        raise HTTPException(400, "Password must be at least 6 characters")
+def _create_user(body: SignupRequest, hashed: str) -> tuple[int, int]:
     conn = get_main_db()
     count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
     is_admin = 1 if count == 0 else 0
     try:
         cur = conn.execute(
             "INSERT INTO users (username, email, hashed_password, is_admin) VALUES (?,?,?,?)",
-            (body.username.strip(), body.email.strip().lower(), hash_password(body.password), is_admin)
+            (body.username.strip(), body.email.strip().lower(), hashed, is_admin)
         )
         user_id = cur.lastrowid
         conn.commit()
@@ -30,17 +33,45 @@ def signup(body: SignupRequest):
         raise HTTPException(400, "Username or email already exists")
     conn.close()
     init_user_db(user_id)
+    return user_id, is_admin
+
+@router.post("/signup")
+async def signup(body: SignupRequest):
+    if len(body.password) < 6:
+        raise HTTPException(400, "Password must be at least 6 characters")
+    hashed = await HASH_EXECUTOR.run(hash_password, body.password)
+    user_id, is_admin = await IO_EXECUTOR.run(_create_user, body, hashed)
     return {"access_token": create_token(user_id), "token_type": "bearer", "is_admin": bool(is_admin)}
 
-@router.post("/login")
-def login(form: OAuth2PasswordRequestForm = Depends()):
+def _find_user(login_name: str):
     conn = get_main_db()
     user = conn.execute(
-        "SELECT * FROM users WHERE username = ? OR email = ?", (form.username, form.username)
+        "SELECT * FROM users WHERE username = ? OR email = ?", (login_name, login_name)
     ).fetchone()
     conn.close()
-    if not user or not verify_password(form.password, user["hashed_password"]):
+    return user
+
+def _rehash(user_id: int, hashed: str):
+    conn = get_main_db()
+    conn.execute("UPDATE users SET hashed_password=? WHERE id=?", (hashed, user_id))
+    conn.commit()
+    conn.close()
+    invalidate_user(user_id)
+
+@router.post("/login")
+async def login(request: Request, form: OAuth2PasswordRequestForm = Depends()):
+    ip   = client_ip(request)
+    await IO_EXECUTOR.run(check_login_rate, ip, form.username)
+    user = await IO_EXECUTOR.run(_find_user, form.username)
+    valid, new_hash = await HASH_EXECUTOR.run(verify_and_update, form.password,
+                                              user["hashed_password"] if user else None)
+    if not valid:
+        await IO_EXECUTOR.run(record_login_failure, ip, form.username)
         raise HTTPException(401, "Invalid username or password")
+    await IO_EXECUTOR.run(clear_login_failures, form.username)
+    # ── Transparent rehash when BCRYPT_ROUNDS changed ──
+    if new_hash:
+        await IO_EXECUTOR.run(_rehash, user["id"], new_hash)
     return {"access_token": create_token(user["id"]), "token_type": "bearer", "is_admin": bool(user["is_admin"])}
 
 @router.get("/me")
@@ -49,11 +80,21 @@ def me(user=Depends(get_current_user)):
             "is_admin": bool(user["is_admin"]), "created_at": user["created_at"]}
 
 @router.get("/users")
-def list_users(admin=Depends(require_admin)):
-    conn = get_main_db()
-    users = conn.execute("SELECT id, username, email, is_admin, created_at FROM users ORDER BY id").fetchall()
-    conn.close()
-    return [dict(u) for u in users]
+def list_users(limit: int = Query(200, ge=1, le=1000), after_id: int = Query(0, ge=0),
+               admin=Depends(require_admin)):
+    """Users with their stats, by id; page with after_id = the last id returned."""
+    return analytics.list_users(limit, after_id)
+
+@router.get("/analytics")
+def get_analytics(admin=Depends(require_admin)):
+    """Totals across all users (from user_stats)."""
+    return analytics.summary()
+
+@router.post("/analytics/rebuild")
+def rebuild_analytics(admin=Depends(require_admin)):
+    """Recompute user_stats from every user's database in the background."""
+    background.submit(("analytics-rebuild",), analytics.rebuild)
+    return {"ok": True, "queued": True}
 
 @router.post("/users/{user_id}/toggle-admin")
 def toggle_admin(user_id: int, admin=Depends(require_admin)):
@@ -63,6 +104,7 @@ def toggle_admin(user_id: int, admin=Depends(require_admin)):
     conn.execute("UPDATE users SET is_admin = CASE WHEN is_admin=1 THEN 0 ELSE 1 END WHERE id=?", (user_id,))
     conn.commit()
     conn.close()
+    invalidate_user(user_id)
     return {"ok": True}
 
 @router.delete("/users/{user_id}")
@@ -73,4 +115,12 @@ def delete_user(user_id: int, admin=Depends(require_admin)):
     conn.execute("DELETE FROM users WHERE id=?", (user_id,))
     conn.commit()
     conn.close()
+    invalidate_user(user_id)
+    blob_store.release_user(user_id)
+    evict_user_db(user_id)
+    analytics.forget(user_id)
     return {"ok": True}
+
+@router.get("/cache-stats")
+def get_cache_stats(admin=Depends(require_admin)):
+    return cache_stats()
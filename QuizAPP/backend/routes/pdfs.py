@@ -1,58 +1,223 @@
 import os
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import hashlib
+import tempfile
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from multipart.multipart import MultipartParser, parse_options_header
 from auth import get_current_user
-from database import get_user_db, get_user_pdfs_dir
+from database import get_user_db, get_blob_path, get_blob_staging_dir
+from executors import IO_EXECUTOR
+import analytics
+import http_cache
+import blob_store
+import ingest
+import search
 
 router = APIRouter(prefix="/pdfs", tags=["pdfs"])
 
-@router.post("/upload")
-async def upload_pdf(files: list[UploadFile] = File(...), user=Depends(get_current_user)):
-    user_id  = user["id"]
-    pdfs_dir = get_user_pdfs_dir(user_id)
-    conn     = get_user_db(user_id)
-    uploaded = []
-    for file in files:
-        if not file.filename.lower().endswith(".pdf"):
-            continue
-        content  = await file.read()
-        safe_name    = os.path.basename(file.filename)
-        dest_path    = os.path.join(pdfs_dir, safe_name)
-        with open(dest_path, "wb") as f:
-            f.write(content)
-        display_name = os.path.splitext(safe_name)[0].replace("-", " ").replace("_", " ").title()
+# The multipart body is parsed incrementally from the request stream: each PDF
+# part is hashed, size-checked and written to a temp file as it arrives (no
+# spooled copy first), and the files only move into the blob store once every
+# file in the request is complete, so memory stays flat whatever the file size
+# and an oversized file is rejected as soon as it crosses the limit.
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "100")) * (1 << 20)
+
+def _open_temp(staging: str):
+    fd, path = tempfile.mkstemp(dir=staging, prefix="upload-", suffix=".part")
+    return os.fdopen(fd, "wb"), path
+
+def _discard(paths: list[str]):
+    for path in paths:
         try:
-            conn.execute("INSERT OR REPLACE INTO pdfs (name, filename, size_bytes) VALUES (?,?,?)",
-                        (display_name, safe_name, len(content)))
-        except Exception:
+            os.remove(path)
+        except FileNotFoundError:
             pass
-        uploaded.append({"name": display_name, "filename": safe_name})
-    conn.commit()
-    conn.close()
+
+class _StagedFile:
+    def __init__(self, f, path: str, filename: str):
+        self.f, self.path, self.filename = f, path, filename
+        self.digest = hashlib.sha256()
+        self.size   = 0
+
+async def _stream_uploads(request: Request, staging: str) -> list[tuple[str, str, int, str]]:
+    """Stage every .pdf part of the "files" field straight from the request body;
+    returns [(temp path, filename, size, sha256)]."""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(400, "Expected multipart/form-data")
+
+    # The parser's callbacks only record events; they are acted on (with
+    # awaited file writes) after each chunk of the body has been fed in.
+    events, field, value, headers = [], [], [], {}
+
+    def on_header_end():
+        headers[b"".join(field).lower()] = b"".join(value)
+        field.clear()
+        value.clear()
+
+    def on_headers_finished():
+        events.append(("begin", dict(headers)))
+        headers.clear()
+
+    parser = MultipartParser(params[b"boundary"], callbacks={
+        "on_header_field":     lambda data, start, end: field.append(data[start:end]),
+        "on_header_value":     lambda data, start, end: value.append(data[start:end]),
+        "on_header_end":       on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data":        lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end":         lambda: events.append(("end", None)),
+    })
+    staged, current = [], None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, payload in events:
+                if kind == "begin":
+                    _, disposition = parse_options_header(payload.get(b"content-disposition", b""))
+                    filename = os.path.basename(disposition.get(b"filename", b"").decode("utf-8", "replace"))
+                    if disposition.get(b"name") == b"files" and filename.lower().endswith(".pdf"):
+                        current = _StagedFile(*await IO_EXECUTOR.run(_open_temp, staging), filename)
+                elif kind == "data" and current:
+                    current.size += len(payload)
+                    if current.size > MAX_UPLOAD_BYTES:
+                        raise HTTPException(413, f"{current.filename} exceeds {MAX_UPLOAD_BYTES >> 20} MB")
+                    current.digest.update(payload)
+                    await IO_EXECUTOR.run(current.f.write, payload)
+                elif kind == "end" and current:
+                    await IO_EXECUTOR.run(current.f.close)
+                    staged.append((current.path, current.filename, current.size, current.digest.hexdigest()))
+                    current = None
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        if current:
+            await IO_EXECUTOR.run(current.f.close)
+            staged.append((current.path,))
+        await IO_EXECUTOR.run(_discard, [s[0] for s in staged])
+        raise
+    return staged
+
+def _store_uploads(user_id: int, staged: list[tuple]) -> list[dict]:
+    """Add staged temp files to the blob store and insert their rows in one
+    transaction. Files whose content the user already has are dropped. Blob
+    references taken are released again if the transaction fails; files of
+    replaced rows are only released once it has committed."""
+    conn     = get_user_db(user_id)
+    uploaded = []
+    added    = {"pdfs": 0, "storage_bytes": 0}
+    refs     = []   # blob refs taken by this upload
+    replaced = []   # rows overwritten by a same-named upload
+    try:
+        known = {r["sha256"]: r["filename"] for r in conn.execute("SELECT sha256, filename FROM pdfs")}
+        for temp_path, safe_name, size, sha256 in staged:
+            display_name = os.path.splitext(safe_name)[0].replace("-", " ").replace("_", " ").title()
+            if sha256 in known:
+                _discard([temp_path])
+                uploaded.append({"name": display_name, "filename": safe_name, "duplicate_of": known[sha256]})
+                continue
+            old = conn.execute("SELECT * FROM pdfs WHERE filename=?", (safe_name,)).fetchone()
+            blob_store.add_ref(sha256, size, temp_path)
+            refs.append(sha256)
+            cur = conn.execute(
+                "INSERT OR REPLACE INTO pdfs (name, filename, size_bytes, sha256, blob, ingest_status) "
+                "VALUES (?,?,?,?,1,'pending')", (display_name, safe_name, size, sha256))
+            if old:
+                replaced.append(old)
+            added["pdfs"]          += 0 if old else 1
+            added["storage_bytes"] += size - ((old["size_bytes"] or 0) if old else 0)
+            known[sha256] = safe_name
+            uploaded.append({"name": display_name, "filename": safe_name, "id": cur.lastrowid, "sha256": sha256})
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        for sha256 in refs:
+            blob_store.release(sha256)
+        raise
+    finally:
+        conn.close()
+    for old in replaced:
+        if old["blob"]:
+            blob_store.release(old["sha256"])
+        else:
+            # Pre-blob-store row: its file lives in the user's pdfs dir
+            _discard([blob_store.pdf_path(user_id, old)])
+    if staged:
+        analytics.record(user_id, **added)
+    return uploaded
+
+@router.post("/upload")
+async def upload_pdf(request: Request, user=Depends(get_current_user)):
+    """Multipart form with one or more PDFs in the "files" field."""
+    user_id  = user["id"]
+    staging  = await IO_EXECUTOR.run(get_blob_staging_dir)
+    staged   = await _stream_uploads(request, staging)
+    try:
+        uploaded = await IO_EXECUTOR.run(_store_uploads, user_id, staged)
+    except BaseException:
+        await IO_EXECUTOR.run(_discard, [s[0] for s in staged])
+        raise
+    for item in uploaded:
+        if "id" in item:
+            sha256 = item.pop("sha256")
+            ingest.enqueue(user_id, item.pop("id"), get_blob_path(sha256), sha256)
     return {"uploaded": uploaded, "count": len(uploaded)}
 
 @router.get("/list")
-def list_pdfs(user=Depends(get_current_user)):
+def list_pdfs(request: Request, user=Depends(get_current_user)):
+    tag = http_cache.etag(user["id"], "pdfs")
+    if cached := http_cache.not_modified(request, tag):
+        return cached
     conn = get_user_db(user["id"])
     rows = conn.execute(
         "SELECT p.id, p.name, p.filename, p.size_bytes, p.uploaded_at, "
+        "p.ingest_status, p.pages_processed, p.num_pages, "
         "pr.total_answered, pr.total_correct, pr.sessions, pr.last_score, pr.last_session "
         "FROM pdfs p LEFT JOIN progress pr ON pr.pdf_id = p.id ORDER BY p.name"
     ).fetchall()
     conn.close()
-    return [dict(r) for r in rows]
+    return http_cache.json_response([dict(r) for r in rows], tag)
 
 @router.delete("/{pdf_id}")
 def delete_pdf(pdf_id: int, user=Depends(get_current_user)):
     user_id = user["id"]
     conn    = get_user_db(user_id)
-    row     = conn.execute("SELECT filename FROM pdfs WHERE id=?", (pdf_id,)).fetchone()
+    row     = conn.execute("SELECT * FROM pdfs WHERE id=?", (pdf_id,)).fetchone()
     if not row:
+        conn.close()
         raise HTTPException(404, "PDF not found")
-    file_path = os.path.join(get_user_pdfs_dir(user_id), row["filename"])
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    if row["blob"]:
+        blob_store.release(row["sha256"])
+    else:
+        file_path = blob_store.pdf_path(user_id, row)
+        if os.path.exists(file_path):
+            os.remove(file_path)
     conn.execute("DELETE FROM pdfs WHERE id=?", (pdf_id,))
-    conn.execute("DELETE FROM quiz_cache WHERE pdf_id=?", (pdf_id,))
+    quizzes = conn.execute("DELETE FROM quiz_cache WHERE pdf_id=?", (pdf_id,)).rowcount
+    banked  = conn.execute("DELETE FROM question_bank WHERE pdf_id=?", (pdf_id,)).rowcount
+    search.remove_pdf(conn, pdf_id)
     conn.commit()
     conn.close()
+    analytics.record(user_id, pdfs=-1, storage_bytes=-(row["size_bytes"] or 0),
+                     cached_quizzes=-quizzes, bank_questions=-banked)
     return {"ok": True}
+
+@router.get("/{pdf_id}/search")
+def search_pdf(pdf_id: int, q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50),
+               user=Depends(get_current_user)):
+    """Passages of the PDF ranked for the query (FTS5 bm25), with highlighted snippets."""
+    user_id = user["id"]
+    conn    = get_user_db(user_id)
+    row     = conn.execute("SELECT * FROM pdfs WHERE id=?", (pdf_id,)).fetchone()
+    conn.close()
+    if not row:
+        raise HTTPException(404, "PDF not found")
+    try:
+        ingest.wait(user_id, pdf_id)
+    except TimeoutError:
+        raise HTTPException(503, "This PDF is still being processed, try again shortly")
+    if not search.is_indexed(user_id, pdf_id):
+        # Ingested before the index existed: re-run ingestion (text and chunks are cached)
+        pdf_path, sha256 = blob_store.adopt_legacy(user_id, row)
+        if os.path.exists(pdf_path):
+            ingest.enqueue(user_id, pdf_id, pdf_path, sha256).result()
+    hits = search.search(user_id, pdf_id, q, limit)
+    return [{k: h[k] for k in ("chunk", "snippet", "score")} for h in hits]
@@ -1,18 +1,45 @@
 import os
+import gzip
 import json
-from fastapi import APIRouter, HTTPException, Depends, Query
+import time
+import sqlite3
+import asyncio
+import logging
+import functools
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from auth import get_current_user
-from database import get_user_db, get_user_pdfs_dir
-from pdf_parser import extract_text_from_pdf
-from quiz_generator import generate_quiz
+from database import get_user_db
+from text_store import get_chunks, load_chunks
+from question_cache import chunk_hash, forget_chunks
+from quiz_generator import generate_quiz_from_chunks_async, iter_chunk_questions, run_in_engine, stream_from_engine
+from singleflight import SingleFlight, StripedLock
+from compression import accepts
+from executors import CPU_EXECUTOR, IO_EXECUTOR, LLM_GATE, Overloaded
+from metrics import GENERATE_STAGE, QUIZ_CACHE
+from serialization import cached_quiz_body, dumps
+import analytics
+import blob_store
+import http_cache
+import ingest
+import progress
+import question_bank
+import search
 
 router = APIRouter(prefix="/quiz", tags=["quiz"])
+log    = logging.getLogger(__name__)
+
+# Identical concurrent generate calls share one computation, and writes to a
+# PDF's quiz_cache rows are serialized.
+_generate_flights = SingleFlight()
+_cache_lock       = StripedLock()
 
 class GenerateRequest(BaseModel):
     pdf_id: int
     num_questions: int = 5
     difficulty: str = "medium"
+    topic: str | None = None   # only quiz the passages that best match this (not cached)
 
 class SaveProgressRequest(BaseModel):
     pdf_id: int
@@ -20,86 +47,263 @@ class SaveProgressRequest(BaseModel):
     questions_answered: int
     questions_correct: int
     score_pct: int
+    difficulty: str | None = None
 
-@router.post("/generate")
-def generate(body: GenerateRequest, user=Depends(get_current_user), fresh: bool = Query(False)):
-    user_id = user["id"]
+def _get_pdf(user_id: int, pdf_id: int):
     conn    = get_user_db(user_id)
-    pdf_row = conn.execute("SELECT * FROM pdfs WHERE id=?", (body.pdf_id,)).fetchone()
+    pdf_row = conn.execute("SELECT * FROM pdfs WHERE id=?", (pdf_id,)).fetchone()
+    conn.close()
     if not pdf_row:
-        conn.close()
         raise HTTPException(404, "PDF not found")
+    return pdf_row
 
-    # ── Check quiz cache first (saves OpenAI API costs!) ──
-    if not fresh:
-        cached = conn.execute(
-            "SELECT quiz_json FROM quiz_cache WHERE pdf_id=? AND num_questions=? AND difficulty=?",
-            (body.pdf_id, body.num_questions, body.difficulty)
-        ).fetchone()
-        if cached:
-            conn.close()
-            return {"status": "success", "quiz": json.loads(cached["quiz_json"]),
-                    "pdf_name": pdf_row["name"], "cached": True}
+def _get_cached_body(user_id: int, body: GenerateRequest) -> bytes | None:
+    """The stored, gzipped response for a cache hit (see serialization.cached_quiz_body)."""
+    conn   = get_user_db(user_id)
+    cached = conn.execute(
+        "SELECT body_gz FROM quiz_cache WHERE pdf_id=? AND num_questions=? AND difficulty=?",
+        (body.pdf_id, body.num_questions, body.difficulty)
+    ).fetchone()
+    conn.close()
+    return cached["body_gz"] if cached else None
+
+def _get_cached_quiz(user_id: int, body: GenerateRequest) -> dict | None:
+    cached = _get_cached_body(user_id, body)
+    return json.loads(gzip.decompress(cached))["quiz"] if cached else None
+
+def _json_response(payload: dict) -> Response:
+    return Response(dumps(payload), media_type="application/json")
+
+def _gzip_response(request: Request, body_gz: bytes) -> Response:
+    """Send stored gzip bytes as-is, or inflate them for clients that don't accept gzip."""
+    if accepts(request.headers.get("accept-encoding", ""), "gzip"):
+        return Response(body_gz, media_type="application/json",
+                        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+    return Response(gzip.decompress(body_gz), media_type="application/json", headers={"Vary": "Accept-Encoding"})
 
-    pdf_path = os.path.join(get_user_pdfs_dir(user_id), pdf_row["filename"])
+async def _await_ingest(user_id: int, pdf_id: int):
+    """Wait for a running ingestion on the event loop, before chunk loading
+    is handed to CPU_EXECUTOR, so a slow job doesn't pin a CPU worker."""
+    try:
+        await ingest.wait_async(user_id, pdf_id)
+    except TimeoutError:
+        pass   # stuck ingestion: _get_pdf_chunks extracts inline
+
+def _get_pdf_chunks(user_id: int, pdf_row, wait: bool = True) -> list[str]:
+    pdf_path, sha256 = blob_store.adopt_legacy(user_id, pdf_row)
     if not os.path.exists(pdf_path):
-        conn.close()
         raise HTTPException(404, "PDF file missing from disk")
-    text = extract_text_from_pdf(pdf_path)
-    if not text.strip():
-        conn.close()
+    if wait:
+        try:
+            ingest.wait(user_id, pdf_row["id"])
+        except TimeoutError:
+            pass   # stuck ingestion: retry inline below
+    chunks = get_chunks(pdf_path, sha256)
+    if not any(c.strip() for c in chunks):
         raise HTTPException(422, "Could not extract text from this PDF")
+    return chunks
 
-    quiz = generate_quiz(text, num_questions=body.num_questions, difficulty=body.difficulty)
+def _get_quiz_chunks(user_id: int, pdf_row, body: GenerateRequest) -> list[str]:
+    """Run on CPU_EXECUTOR after _await_ingest."""
+    chunks = _get_pdf_chunks(user_id, pdf_row, wait=False)
+    if body.topic:
+        chunks = search.top_chunks(user_id, pdf_row["id"], body.topic, chunks)
+        if not chunks:
+            raise HTTPException(404, "Nothing in this PDF matches that topic")
+    return chunks
 
-    # ── Cache the result ──
+def _sample_bank(user_id: int, pdf_row, body: GenerateRequest) -> dict | None:
+    questions = question_bank.sample(user_id, body.pdf_id, body.difficulty, body.num_questions,
+                                     lambda: _get_pdf_chunks(user_id, pdf_row))
+    return {"questions": questions} if questions else None
+
+def _count(user_id: int, **deltas):
+    """Bump the user's admin analytics counters off the request path."""
     try:
-        conn.execute(
-            "INSERT OR REPLACE INTO quiz_cache (pdf_id, num_questions, difficulty, quiz_json) VALUES (?,?,?,?)",
-            (body.pdf_id, body.num_questions, body.difficulty, json.dumps(quiz))
-        )
-        conn.commit()
-    except Exception:
+        IO_EXECUTOR.submit(functools.partial(analytics.record, user_id, **deltas))
+    except Overloaded:
         pass
-    conn.close()
 
-    return {"status": "success", "quiz": quiz, "pdf_name": pdf_row["name"], "cached": False}
+def _save_quiz(user_id: int, body: GenerateRequest, quiz: dict, pdf_name: str):
+    with _cache_lock((user_id, body.pdf_id)):
+        conn = get_user_db(user_id)
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM quiz_cache WHERE pdf_id=? AND num_questions=? AND difficulty=?",
+                (body.pdf_id, body.num_questions, body.difficulty)
+            ).fetchone()
+            # quiz_json is written explicitly: databases created before body_gz have it NOT NULL without a default
+            conn.execute(
+                "INSERT OR REPLACE INTO quiz_cache (pdf_id, num_questions, difficulty, quiz_json, body_gz) "
+                "VALUES (?,?,?,'',?)",
+                (body.pdf_id, body.num_questions, body.difficulty, cached_quiz_body(quiz, pdf_name))
+            )
+            conn.commit()
+            if not exists:
+                analytics.record(user_id, cached_quizzes=1)
+        except sqlite3.Error:
+            # Caching is best effort, but a failure here must be visible
+            log.exception("Could not cache quiz for user %s pdf %s", user_id, body.pdf_id)
+        finally:
+            conn.close()
+
+async def _generate_and_cache(user_id: int, pdf_row, body: GenerateRequest, fresh: bool) -> tuple[dict, bool]:
+    """Run by the single-flight leader; returns (quiz, served from cache)."""
+    if not fresh and not body.topic:
+        # A flight that just finished may have filled the cache
+        cached = await IO_EXECUTOR.run(_get_cached_quiz, user_id, body)
+        if cached:
+            return cached, True
+    with GENERATE_STAGE.time(stage="chunks"):
+        await _await_ingest(user_id, pdf_row["id"])
+        chunks = await CPU_EXECUTOR.run(_get_quiz_chunks, user_id, pdf_row, body)
+    with LLM_GATE.hold(user_id), GENERATE_STAGE.time(stage="llm"):
+        quiz = await asyncio.wrap_future(run_in_engine(generate_quiz_from_chunks_async(
+            chunks, num_questions=body.num_questions, difficulty=body.difficulty, use_cache=not fresh)))
+    # ── Cache the result ──
+    if not body.topic:
+        with GENERATE_STAGE.time(stage="cache_save"):
+            await IO_EXECUTOR.run(_save_quiz, user_id, body, quiz, pdf_row["name"])
+    return quiz, False
+
+@router.post("/generate")
+async def generate(body: GenerateRequest, request: Request, user=Depends(get_current_user),
+                   fresh: bool = Query(False)):
+    user_id = user["id"]
+    with GENERATE_STAGE.time(stage="pdf_lookup"):
+        pdf_row = await IO_EXECUTOR.run(_get_pdf, user_id, body.pdf_id)
+
+    # ── Sample the question bank, then check quiz cache (saves OpenAI API costs!) ──
+    if not fresh and not body.topic:
+        with GENERATE_STAGE.time(stage="bank"):
+            banked = await IO_EXECUTOR.run(_sample_bank, user_id, pdf_row, body)
+        if banked:
+            QUIZ_CACHE.inc(result="bank")
+            _count(user_id, cache_hits=1)
+            return _json_response({"status": "success", "quiz": banked, "pdf_name": pdf_row["name"],
+                                   "cached": True, "bank": True})
+        with GENERATE_STAGE.time(stage="cache_lookup"):
+            cached = await IO_EXECUTOR.run(_get_cached_body, user_id, body)
+        if cached:
+            QUIZ_CACHE.inc(result="hit")
+            _count(user_id, cache_hits=1)
+            return _gzip_response(request, cached)
+
+    key = (user_id, body.pdf_id, body.num_questions, body.difficulty, body.topic, fresh)
+    (quiz, cached), _ = await _generate_flights.do(key, _generate_and_cache, user_id, pdf_row, body, fresh)
+    QUIZ_CACHE.inc(result="hit" if cached else ("fresh" if fresh else "miss"))
+    _count(user_id, **({"cache_hits": 1} if cached else {"generations": 1}))
+
+    return _json_response({"status": "success", "quiz": quiz, "pdf_name": pdf_row["name"], "cached": cached})
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/generate/stream")
+async def generate_stream(body: GenerateRequest, user=Depends(get_current_user), fresh: bool = Query(False)):
+    """Server-Sent Events variant of /generate: emits `meta`, then one `question`
+    event per question as soon as its chunk is parsed, then `done` (or `error`)."""
+    user_id = user["id"]
+    pdf_row = await IO_EXECUTOR.run(_get_pdf, user_id, body.pdf_id)
+    cached  = None
+    if not fresh and not body.topic:
+        cached = (await IO_EXECUTOR.run(_sample_bank, user_id, pdf_row, body)
+                  or await IO_EXECUTOR.run(_get_cached_quiz, user_id, body))
+    QUIZ_CACHE.inc(result="hit" if cached else ("fresh" if fresh else "miss"))
+    _count(user_id, **({"cache_hits": 1} if cached else {"generations": 1}))
+    chunks  = None
+    if not cached:
+        LLM_GATE.check(user_id)
+        with GENERATE_STAGE.time(stage="chunks"):
+            await _await_ingest(user_id, pdf_row["id"])
+            chunks = await CPU_EXECUTOR.run(_get_quiz_chunks, user_id, pdf_row, body)
+
+    async def events():
+        yield _sse("meta", {"pdf_name": pdf_row["name"], "cached": cached is not None})
+        if cached:
+            for i, question in enumerate(cached["questions"]):
+                yield _sse("question", {"index": i, "question": question})
+            yield _sse("done", {"count": len(cached["questions"])})
+            return
+        questions = []
+        try:
+            with LLM_GATE.hold(user_id):
+                async for _, qs in stream_from_engine(
+                        iter_chunk_questions(chunks, body.num_questions, body.difficulty, use_cache=not fresh)):
+                    for question in qs:
+                        yield _sse("question", {"index": len(questions), "question": question})
+                        questions.append(question)
+        except Overloaded as e:
+            yield _sse("error", {"detail": e.detail, "retry_after": e.retry_after})
+            return
+        except Exception:
+            yield _sse("error", {"detail": "Quiz generation failed"})
+            return
+        if not body.topic:
+            await IO_EXECUTOR.run(_save_quiz, user_id, body, {"questions": questions}, pdf_row["name"])
+        yield _sse("done", {"count": len(questions)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.post("/save-progress")
 def save_progress(body: SaveProgressRequest, user=Depends(get_current_user)):
-    user_id  = user["id"]
-    conn     = get_user_db(user_id)
-    existing = conn.execute("SELECT * FROM progress WHERE pdf_id=?", (body.pdf_id,)).fetchone()
-    if existing:
-        conn.execute("""UPDATE progress SET
-            total_answered = total_answered + ?,
-            total_correct  = total_correct  + ?,
-            sessions       = sessions + 1,
-            last_score     = ?,
-            last_session   = datetime('now')
-            WHERE pdf_id = ?""",
-            (body.questions_answered, body.questions_correct, body.score_pct, body.pdf_id))
-    else:
-        conn.execute("""INSERT INTO progress
-            (pdf_id, pdf_name, total_answered, total_correct, sessions, last_score, last_session)
-            VALUES (?,?,?,?,1,?,datetime('now'))""",
-            (body.pdf_id, body.pdf_name, body.questions_answered, body.questions_correct, body.score_pct))
-    conn.commit()
-    conn.close()
+    progress.record_session(user["id"], body.pdf_id, body.pdf_name, body.questions_answered,
+                            body.questions_correct, body.score_pct, body.difficulty)
     return {"ok": True}
 
 @router.get("/progress")
-def get_progress(user=Depends(get_current_user)):
+def get_progress(request: Request, user=Depends(get_current_user)):
+    tag = http_cache.etag(user["id"], "progress")
+    if cached := http_cache.not_modified(request, tag):
+        return cached
     conn = get_user_db(user["id"])
     rows = conn.execute("SELECT * FROM progress").fetchall()
     conn.close()
-    return [dict(r) for r in rows]
+    return http_cache.json_response([dict(r) for r in rows], tag)
+
+@router.get("/dashboard")
+def dashboard(request: Request, days: int = Query(progress.DASHBOARD_DAYS, ge=1, le=366),
+              user=Depends(get_current_user)):
+    """Totals, streaks, per-day and per-difficulty accuracy and recent sessions."""
+    # Streaks and the day window also change with the date
+    tag = http_cache.etag(user["id"], "dashboard", days, time.strftime("%Y%m%d", time.gmtime()))
+    if cached := http_cache.not_modified(request, tag):
+        return cached
+    return http_cache.json_response(progress.dashboard(user["id"], days), tag)
+
+@router.get("/sessions")
+def list_sessions(pdf_id: int | None = None, before: str | None = None, before_id: int | None = None,
+                  limit: int = Query(50, ge=1, le=500), user=Depends(get_current_user)):
+    """Quiz history, newest first; page with `before` / `before_id` = the last row's finished_at / id."""
+    return progress.list_sessions(user["id"], pdf_id, before, before_id, limit)
 
 @router.delete("/cache/{pdf_id}")
 def clear_cache(pdf_id: int, user=Depends(get_current_user)):
-    """Clear cached quizzes for a PDF so fresh ones are generated next time."""
-    conn = get_user_db(user["id"])
-    conn.execute("DELETE FROM quiz_cache WHERE pdf_id=?", (pdf_id,))
+    """Clear cached quizzes for a PDF so fresh ones are generated next time: the
+    cached responses, its question bank and the questions stored per chunk."""
+    pdf_row = _get_pdf(user["id"], pdf_id)
+    conn    = get_user_db(user["id"])
+    removed = conn.execute("DELETE FROM quiz_cache WHERE pdf_id=?", (pdf_id,)).rowcount
+    banked  = conn.execute("DELETE FROM question_bank WHERE pdf_id=?", (pdf_id,)).rowcount
     conn.commit()
     conn.close()
+    chunks = load_chunks(pdf_row["sha256"]) if pdf_row["sha256"] else None
+    forget_chunks([chunk_hash(c) for c in chunks or []])
+    analytics.record(user["id"], cached_quizzes=-removed, bank_questions=-banked)
     return {"ok": True}
+
+@router.get("/bank/{pdf_id}")
+def bank_status(pdf_id: int, user=Depends(get_current_user)):
+    """Question-bank size per difficulty (total and still unseen)."""
+    _get_pdf(user["id"], pdf_id)
+    return question_bank.bank_counts(user["id"], pdf_id)
+
+@router.post("/bank/{pdf_id}/fill")
+def fill_bank(pdf_id: int, difficulty: str = Query("medium"),
+              count: int = Query(question_bank.BANK_SIZE, ge=1, le=200), user=Depends(get_current_user)):
+    """Queue a background job generating `count` questions into the bank."""
+    user_id = user["id"]
+    pdf_row = _get_pdf(user_id, pdf_id)
+    question_bank.schedule_fill(user_id, pdf_id, difficulty, lambda: _get_pdf_chunks(user_id, pdf_row), count)
+    return {"ok": True, "queued": count}
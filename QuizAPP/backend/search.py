@@ -0,0 +1,63 @@
+import os
+import re
+from database import get_user_db
+
+# Full-text search over each PDF's chunks: an FTS5 table (chunk_index) in the
+# user's data.db, filled at ingestion. A chunk's rowid is
+# pdf_id * ROWID_SPAN + its index, so one PDF's rows form a contiguous range.
+ROWID_SPAN   = 1 << 20
+# Chunks sent to the model for a topic-targeted quiz
+TOPIC_CHUNKS = int(os.environ.get("TOPIC_CHUNKS", "3"))
+WORD_RE      = re.compile(r"\w+")
+
+def _rowids(pdf_id: int) -> tuple[int, int]:
+    return pdf_id * ROWID_SPAN, (pdf_id + 1) * ROWID_SPAN - 1
+
+def match_query(text: str) -> str | None:
+    """Free text -> FTS5 query matching any of its words (bm25 ranks chunks with more of them first)."""
+    words = WORD_RE.findall(text)
+    return " OR ".join(f'"{w}"' for w in words) if words else None
+
+def index_pdf(user_id: int, pdf_id: int, chunks: list[str]):
+    first, last = _rowids(pdf_id)
+    conn = get_user_db(user_id)
+    conn.execute("DELETE FROM chunk_index WHERE rowid BETWEEN ? AND ?", (first, last))
+    conn.executemany("INSERT INTO chunk_index (rowid, text) VALUES (?,?)",
+                     [(first + i, c) for i, c in enumerate(chunks) if c.strip()])
+    conn.commit()
+    conn.close()
+
+def remove_pdf(conn, pdf_id: int):
+    """Drop a PDF's rows inside the caller's transaction."""
+    conn.execute("DELETE FROM chunk_index WHERE rowid BETWEEN ? AND ?", _rowids(pdf_id))
+
+def is_indexed(user_id: int, pdf_id: int) -> bool:
+    conn = get_user_db(user_id)
+    row  = conn.execute("SELECT 1 FROM chunk_index WHERE rowid BETWEEN ? AND ? LIMIT 1", _rowids(pdf_id)).fetchone()
+    conn.close()
+    return row is not None
+
+def search(user_id: int, pdf_id: int, query: str, limit: int = 10) -> list[dict]:
+    """Best-matching chunks of one PDF: index, highlighted snippet and bm25 score."""
+    match = match_query(query)
+    if match is None:
+        return []
+    first, last = _rowids(pdf_id)
+    conn = get_user_db(user_id)
+    rows = conn.execute(
+        "SELECT rowid, snippet(chunk_index, 0, '<mark>', '</mark>', '…', 24) AS snippet, "
+        "bm25(chunk_index) AS score, text FROM chunk_index "
+        "WHERE chunk_index MATCH ? AND rowid BETWEEN ? AND ? ORDER BY rank LIMIT ?",
+        (match, first, last, limit)
+    ).fetchall()
+    conn.close()
+    return [{"chunk": r["rowid"] - first, "snippet": r["snippet"], "score": round(-r["score"], 4),
+             "text": r["text"]} for r in rows]
+
+def top_chunks(user_id: int, pdf_id: int, topic: str, chunks: list[str], limit: int = TOPIC_CHUNKS) -> list[str]:
+    """The chunks ranking best for topic, in document order (indexing the PDF
+    first if it was ingested before the index existed)."""
+    if not is_indexed(user_id, pdf_id):
+        index_pdf(user_id, pdf_id, chunks)
+    hits = search(user_id, pdf_id, topic, limit)
+    return [h["text"] for h in sorted(hits, key=lambda h: h["chunk"])]
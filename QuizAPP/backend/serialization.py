@@ -0,0 +1,23 @@
+import gzip
+import json
+
+# Response encoding helpers. orjson is optional: several times faster than
+# the json module when installed, identical output shape either way.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+def gzip_json(obj) -> bytes:
+    # mtime=0: identical content always compresses to identical bytes
+    return gzip.compress(dumps(obj), compresslevel=6, mtime=0)
+
+def cached_quiz_body(quiz: dict, pdf_name: str) -> bytes:
+    """The complete /quiz/generate response for a quiz_cache hit, gzipped, as
+    stored in quiz_cache.body_gz and sent to the client unchanged."""
+    return gzip_json({"status": "success", "quiz": quiz, "pdf_name": pdf_name, "cached": True})
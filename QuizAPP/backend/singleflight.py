@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key on one event loop: the first
+    caller runs the coroutine, later callers await it and share its result (or
+    exception)."""
+
+    def __init__(self):
+        self._calls: dict[object, asyncio.Future] = {}
+
+    async def do(self, key, coro_fn, *args):
+        """Returns (result, shared) where shared is True for coalesced callers."""
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await coro_fn(*args)
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()   # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+class StripedLock:
+    """Fixed set of locks selected by key hash — bounded memory for per-key locking."""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
@@ -0,0 +1,67 @@
+import json
+import hashlib
+from database import get_content_db
+from pdf_parser import chunk_text, chunker, extract_pages, join_pages
+from metrics import GENERATE_STAGE
+
+# Extracted PDF text and its chunks, persisted once per unique file (sha256 of
+# its bytes) in content.db and shared by every user who uploaded the same document.
+
+def file_sha256(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_extracted(sha256: str) -> tuple[str, list[int]] | None:
+    conn = get_content_db()
+    row  = conn.execute("SELECT text, page_offsets FROM extracted_text WHERE sha256=?", (sha256,)).fetchone()
+    conn.close()
+    if not row:
+        return None
+    return row["text"], json.loads(row["page_offsets"])
+
+def save_extracted(sha256: str, pages: list[str]) -> tuple[str, list[int]]:
+    text, offsets = join_pages(pages)
+    conn = get_content_db()
+    conn.execute(
+        "INSERT OR IGNORE INTO extracted_text (sha256, text, page_offsets, num_pages) VALUES (?,?,?,?)",
+        (sha256, text, json.dumps(offsets), len(pages))
+    )
+    conn.commit()
+    conn.close()
+    return text, offsets
+
+def get_text(pdf_path: str, sha256: str) -> str:
+    """Extracted text for a PDF, running pdfplumber only on the first request."""
+    stored = load_extracted(sha256)
+    if stored is None:
+        with GENERATE_STAGE.time(stage="extract"):
+            pages = extract_pages(pdf_path)
+        stored = save_extracted(sha256, pages)
+    return stored[0]
+
+def load_chunks(sha256: str) -> list[str] | None:
+    conn = get_content_db()
+    rows = conn.execute("SELECT text FROM chunks WHERE sha256=? AND chunker=? ORDER BY idx",
+                        (sha256, chunker())).fetchall()
+    conn.close()
+    return [r["text"] for r in rows] or None
+
+def save_chunks(sha256: str, chunks: list[str]):
+    conn = get_content_db()
+    conn.executemany("INSERT OR IGNORE INTO chunks (sha256, chunker, idx, text) VALUES (?,?,?,?)",
+                     [(sha256, chunker(), i, c) for i, c in enumerate(chunks)])
+    conn.commit()
+    conn.close()
+
+def get_chunks(pdf_path: str, sha256: str) -> list[str]:
+    """Chunked text for a PDF, extracting and chunking only on the first request."""
+    chunks = load_chunks(sha256)
+    if chunks is None:
+        text = get_text(pdf_path, sha256)
+        with GENERATE_STAGE.time(stage="chunk"):
+            chunks = chunk_text(text)
+        save_chunks(sha256, chunks)
+    return chunks
@@ -47,6 +47,7 @@ export default function App() {
         questions_answered: total,
         questions_correct:  correct,
         score_pct:          pct,
+        difficulty:         activePdf.difficulty,
       }),
     });
 
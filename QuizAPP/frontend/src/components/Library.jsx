@@ -75,7 +75,7 @@ export default function Library({ onQuizReady }) {
       });
       const data = await res.json();
       if (!res.ok) throw new Error(data.detail || "Generation failed");
-      onQuizReady(data.quiz, selected);
+      onQuizReady(data.quiz, { ...selected, difficulty });
     } catch (err) {
       setError(err.message);
     } finally {
@@ -236,10 +236,19 @@ export default function Library({ onQuizReady }) {
 function AdminPanel({ authHeader }) {
   const [users, setUsers] = useState([]);
 
+  // The API returns users in id order, one page at a time; follow after_id to the end
   async function loadUsers() {
-    const res = await fetch("/api/auth/users", { headers: authHeader() });
-    const data = await res.json();
-    setUsers(Array.isArray(data) ? data : []);
+    const PAGE = 500;
+    const all = [];
+    for (let afterId = 0; ; ) {
+      const res = await fetch(`/api/auth/users?limit=${PAGE}&after_id=${afterId}`, { headers: authHeader() });
+      const data = await res.json();
+      if (!Array.isArray(data)) break;
+      all.push(...data);
+      if (data.length < PAGE) break;
+      afterId = data[data.length - 1].id;
+    }
+    setUsers(all);
   }
 
   useEffect(() => { loadUsers(); }, []);